@@ -1,32 +1,1007 @@
-from PIL import Image, ImageTk, ImageDraw, ImageEnhance
 import tkinter as tk
 from tkinter import filedialog, simpledialog, messagebox, ttk
+import math
 import os
 import sys
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+# PIL, pytesseract and the Tesseract path probe are deliberately not imported
+# here: only tkinter is needed to paint the first window. Heavy modules are
+# imported on first use, or ahead of time by start_background_imports().
+
+COLD_START_TARGET_MS = 250
+HEAVY_MODULES = ('PIL', 'PIL.Image', 'PIL.ImageTk', 'pytesseract')
+
+_ocr_lock = threading.Lock()
+_ocr_module = None
+_ocr_checked = False
+
+
+def get_ocr():
+    """Import pytesseract on first use, or return None if it is unavailable."""
+    global _ocr_module, _ocr_checked
+    with _ocr_lock:
+        if _ocr_checked:
+            return _ocr_module
+        try:
+            import pytesseract
+            if os.name == 'nt':  # Windows
+                possible_paths = [
+                    r"C:\Program Files\Tesseract-OCR\tesseract.exe",
+                    r"C:\Program Files (x86)\Tesseract-OCR\tesseract.exe",
+                ]
+                for path in possible_paths:
+                    if os.path.exists(path):
+                        pytesseract.pytesseract.tesseract_cmd = path
+                        break
+            _ocr_module = pytesseract
+        except ImportError:
+            _ocr_module = None
+        _ocr_checked = True
+        return _ocr_module
+
+
+def has_ocr():
+    return get_ocr() is not None
+
+
+def _import_heavy_modules():
+    try:
+        from PIL import Image, ImageTk, ImageDraw, ImageEnhance  # noqa: F401
+    except ImportError as e:
+        print(f"Could not preload image modules: {e}", file=sys.stderr)
+    get_ocr()
+
+
+def start_background_imports():
+    """Import PIL and the OCR engine on a daemon thread while the UI is idle."""
+    thread = threading.Thread(target=_import_heavy_modules, name="warm-imports", daemon=True)
+    thread.start()
+    return thread
+
+
+def benchmark_startup(target_ms=COLD_START_TARGET_MS, runs=5):
+    """Measure cold import time of this module in fresh interpreters.
+
+    Returns True when the best run is under target_ms and no heavy module
+    was pulled in at import time.
+    """
+    import json
+    import subprocess
+
+    module_dir = os.path.dirname(os.path.abspath(__file__))
+    module_name = os.path.splitext(os.path.basename(__file__))[0]
+    probe = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module_name}\n"
+        "elapsed = (time.perf_counter() - start) * 1000\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(json.dumps({'ms': elapsed, 'heavy': heavy}))\n"
+    )
+
+    timings = []
+    heavy = set()
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", probe], cwd=module_dir,
+                                capture_output=True, text=True, check=True)
+        sample = json.loads(result.stdout.strip().splitlines()[-1])
+        timings.append(sample["ms"])
+        heavy.update(sample["heavy"])
+
+    # One extra run with -X importtime to show where the time goes
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+                            cwd=module_dir, capture_output=True, text=True, check=True)
+    offenders = []
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            offenders.append((int(parts[1]), parts[2].rstrip()))
+    offenders.sort(reverse=True)
+
+    best = min(timings)
+    print(f"Cold import: best {best:.1f} ms, median {sorted(timings)[len(timings) // 2]:.1f} ms "
+          f"(target {target_ms} ms)")
+    for cumulative_us, name in offenders[:10]:
+        print(f"  {cumulative_us / 1000:8.1f} ms {name}")
+    if heavy:
+        print(f"Heavy modules imported at startup: {', '.join(sorted(heavy))}")
+
+    return best <= target_ms and not heavy
+
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif', '.gif')
+SHEET_EXTENSIONS = IMAGE_EXTENSIONS + ('.pdf',)
+DEFAULT_PDF_DPI = 150  # Detection/display render of PDF pages
+DEFAULT_OUTPUT_DPI = 600  # Re-render of swatch and label boxes from PDF pages
+
+
+class SharedCache:
+    """Process-wide cache of OCR results and learned layout templates.
+
+    Shared by every open sheet so switching tabs (or re-opening a sheet)
+    never repeats OCR work, and a name position learned on one sheet is
+    reused on the others.
+    """
+
+    def __init__(self, max_ocr_entries=4096):
+        self._lock = threading.Lock()
+        self._ocr = OrderedDict()
+        self.max_ocr_entries = max_ocr_entries
+        self.text_template = None
+        self._skew = {}
+
+    def get_ocr(self, key):
+        with self._lock:
+            if key not in self._ocr:
+                return None, False
+            self._ocr.move_to_end(key)
+            return self._ocr[key], True
+
+    def put_ocr(self, key, text):
+        with self._lock:
+            self._ocr[key] = text
+            self._ocr.move_to_end(key)
+            while len(self._ocr) > self.max_ocr_entries:
+                self._ocr.popitem(last=False)
+
+    def set_text_template(self, offset_x, offset_y, width, height):
+        with self._lock:
+            self.text_template = (offset_x, offset_y, width, height)
+
+    def get_text_template(self):
+        with self._lock:
+            return self.text_template
+
+    def get_skew(self, key):
+        with self._lock:
+            return self._skew.get(key)
+
+    def put_skew(self, key, angle):
+        with self._lock:
+            self._skew[key] = angle
+
+
+SHARED_CACHE = SharedCache()
+
+
+def image_nbytes(image):
+    """Approximate size of a decoded PIL image's pixel buffer."""
+    if image is None:
+        return 0
+    if image.mode.startswith('I;16'):
+        per_pixel = 2
+    elif image.mode in ('I', 'F') or len(image.getbands()) > 1:
+        per_pixel = 4  # Pillow pads multi-band pixels to 32 bits
+    else:
+        per_pixel = 1
+    return image.width * image.height * per_pixel
+
+
+class MemoryBudget:
+    """Tracks decoded images, display buffers and caches against a byte budget.
+
+    Buffers registered with an evict callback are derived from something
+    else (pyramid levels, rendered PhotoImages, preloaded sheets) and are
+    dropped least recently used first when the total is over budget. Others
+    only count towards usage. Callbacks may return False to keep a buffer
+    that is in use (e.g. the image on screen). Trimming happens in
+    enforce(), which the UI calls from the Tk thread.
+    """
+
+    def __init__(self, budget_bytes):
+        self._lock = threading.Lock()
+        self.budget = budget_bytes
+        self._entries = OrderedDict()  # key -> (nbytes, evict callback or None)
+        self.evicted_bytes = 0
+
+    def track(self, key, nbytes, evict=None):
+        with self._lock:
+            self._entries[key] = (nbytes, evict)
+            self._entries.move_to_end(key)
+
+    def touch(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+
+    def release(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    @property
+    def usage(self):
+        with self._lock:
+            return sum(nbytes for nbytes, _ in self._entries.values())
+
+    def enforce(self):
+        """Evict derived buffers, oldest first, until usage fits the budget."""
+        with self._lock:
+            candidates = [key for key, (_, evict) in self._entries.items() if evict is not None]
+        for key in candidates:
+            with self._lock:
+                total = sum(nbytes for nbytes, _ in self._entries.values())
+                if total <= self.budget:
+                    return
+                entry = self._entries.get(key)
+            if entry is None:
+                continue
+            nbytes, evict = entry
+            if evict() is False:
+                continue
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+                self.evicted_bytes += nbytes
+
+    def describe(self):
+        mb = 1024 * 1024
+        return f"Memory: {self.usage / mb:.0f} / {self.budget / mb:.0f} MB"
+
+
+DEFAULT_MEMORY_BUDGET_MB = 2048
+MEMORY = MemoryBudget(DEFAULT_MEMORY_BUDGET_MB * 1024 * 1024)
+
+
+def sheet_key(image_path):
+    """Identify a sheet on disk so cached results survive reloading it."""
+    try:
+        stat = os.stat(image_path)
+        return (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return (os.path.abspath(image_path), None, None)
+
+
+def build_pyramid(image, min_size=256):
+    """Build successively halved copies of an image for fast zoomed-out display."""
+    levels = [image]
+    base = image if image.mode in ('RGB', 'RGBA', 'L', 'LA') else image.convert('RGB')
+    while min(base.size) // 2 >= min_size:
+        base = base.reduce(2)
+        levels.append(base)
+    return levels
+
+
+def _profile_score(edges, angle):
+    """Score how well edge pixels line up with rows and columns after rotating."""
+    from PIL import Image
+
+    rotated = edges.rotate(angle, resample=Image.Resampling.BILINEAR)
+    score = 0.0
+    for size in ((1, rotated.height), (rotated.width, 1)):
+        profile = rotated.resize(size, Image.Resampling.BOX).tobytes()
+        mean = sum(profile) / len(profile)
+        score += sum((v - mean) ** 2 for v in profile) / len(profile)
+    return score
+
+
+def estimate_skew_angle(image, max_angle=5.0, analysis_size=1000):
+    """Estimate the rotation (degrees, counter-clockwise) that deskews a sheet.
+
+    Uses projection profiles of an edge map: swatch and label edges produce
+    sharp peaks in the row/column sums only when they are axis-aligned.
+    """
+    from PIL import Image, ImageFilter
+
+    small = image if image.mode in ('RGB', 'L') else image.convert('RGB')
+    small = small.copy()
+    small.thumbnail((analysis_size, analysis_size), Image.Resampling.BOX)
+    edges = small.convert('L').filter(ImageFilter.FIND_EDGES).point(lambda v: 255 if v > 40 else 0)
+    # The filter marks the image border itself as an edge; drop it so it
+    # doesn't pin the estimate to 0 degrees
+    edges = edges.crop((2, 2, edges.width - 2, edges.height - 2))
+
+    def search(center, span, step):
+        steps = int(round(span / step))
+        candidates = [center + i * step for i in range(-steps, steps + 1)]
+        return max(candidates, key=lambda a: _profile_score(edges, a))
+
+    # Coarse sweep, then refine around the best angle
+    angle = search(0.0, max_angle, 0.5)
+    angle = search(angle, 0.5, 0.1)
+    return round(angle, 2)
+
+
+def _cmyk_to_rgb(image):
+    """Convert CMYK to sRGB through its embedded ICC profile, if it has one."""
+    icc = image.info.get('icc_profile')
+    if icc:
+        import io
+        try:
+            from PIL import ImageCms  # Needs Pillow built with LittleCMS
+        except ImportError as e:
+            print(f"Could not apply the CMYK ICC profile, converting without it: {e}", file=sys.stderr)
+            return image.convert('RGB')
+        try:
+            source_profile = ImageCms.ImageCmsProfile(io.BytesIO(icc))
+            return ImageCms.profileToProfile(image, source_profile, ImageCms.createProfile('sRGB'),
+                                             renderingIntent=ImageCms.Intent.PERCEPTUAL, outputMode='RGB')
+        except (OSError, ImageCms.PyCMSError) as e:
+            print(f"Could not apply the CMYK ICC profile, converting without it: {e}", file=sys.stderr)
+    return image.convert('RGB')
+
+
+def canonical_rgb(image):
+    """Return a sheet as 8-bit sRGB, the one pixel format detection works on.
+
+    Done once when a sheet is loaded so every hot path (detection, edge
+    refinement, OCR, crops, display) indexes plain RGB tuples:
+    CMYK goes through its ICC profile, 16- and 32-bit grayscale is scaled
+    rather than clipped, and palette or transparent images are flattened
+    onto white.
+    """
+    from PIL import Image
+
+    mode = image.mode
+    if mode == 'RGB':
+        return image
+    if mode == 'CMYK':
+        return _cmyk_to_rgb(image)
+    if mode.startswith('I;16') or mode in ('I', 'F'):
+        gray = image if mode in ('I', 'F') else image.convert('I')
+        # 16-bit samples are scaled by the container depth, so a dark scan
+        # stays dark; only data that never exceeds 255 is taken as 8-bit,
+        # and values beyond 16 bits are stretched to fit.
+        high = gray.getextrema()[1]
+        if high <= 255:
+            scale = 1
+        elif high <= 65535:
+            scale = 255 / 65535
+        else:
+            scale = 255 / high
+        if scale != 1:
+            gray = gray.point(lambda v: v * scale)
+        return gray.convert('L').convert('RGB')
+    if mode in ('PA', 'LA', 'La', 'RGBA', 'RGBa') or 'transparency' in image.info:
+        rgba = image.convert('RGBA')
+        background = Image.new('RGBA', rgba.size, (255, 255, 255, 255))
+        return Image.alpha_composite(background, rgba).convert('RGB')
+    return image.convert('RGB')
+
+
+def deskew_image(image, angle):
+    """Rotate a sheet by angle degrees, filling exposed corners with the page color."""
+    from PIL import Image
+
+    if image.mode == 'P':
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+    w, h = image.size
+    corners = [image.getpixel(p) for p in ((0, 0), (w - 1, 0), (0, h - 1), (w - 1, h - 1))]
+    fill = max(set(corners), key=corners.count)
+    try:
+        return image.rotate(angle, resample=Image.Resampling.BICUBIC, fillcolor=fill)
+    except ValueError:
+        # Some modes (e.g. 16-bit) only support nearest-neighbour transforms
+        return image.rotate(angle, resample=Image.Resampling.NEAREST, fillcolor=fill)
+
+
+def normalize_sheet(image, key=None, shared=None, min_angle=0.1):
+    """Return (working image, skew angle) with the sheet deskewed once.
+
+    The estimated angle is cached by sheet key so reopening a sheet skips
+    the estimate; only the final resample is repeated.
+    """
+    shared = shared if shared is not None else SHARED_CACHE
+    angle = shared.get_skew(key) if key is not None else None
+    if angle is None:
+        angle = estimate_skew_angle(image)
+        if key is not None:
+            shared.put_skew(key, angle)
+    if abs(angle) < min_angle:
+        return image, 0.0
+    return deskew_image(image, angle), angle
+
+
+# pdfium is not thread-safe; every call into it goes through this lock
+_pdfium_lock = threading.Lock()
+_pdf_documents = OrderedDict()
+
+
+def _open_pdf(path, keep=4):
+    """Return an open PdfDocument, reusing the last few opened. Call under _pdfium_lock."""
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        raise RuntimeError("PDF input needs pypdfium2 (pip install pypdfium2)") from None
+    key = os.path.abspath(path)
+    if key in _pdf_documents:
+        _pdf_documents.move_to_end(key)
+        return _pdf_documents[key]
+    pdf = pdfium.PdfDocument(path)
+    _pdf_documents[key] = pdf
+    while len(_pdf_documents) > keep:
+        _pdf_documents.popitem(last=False)[1].close()
+    return pdf
+
+
+class SheetSource:
+    """One sheet to extract from: an image file, a TIFF frame or a PDF page.
+
+    Sources are cheap to create and picklable; pixels are only decoded or
+    rendered when open() is called.
+    """
+
+    def __init__(self, path, page=None, page_count=1, dpi=DEFAULT_PDF_DPI):
+        self.path = path
+        self.page = page  # 0-based frame/page index, None for single images
+        self.page_count = page_count
+        self.dpi = dpi
+
+    @property
+    def is_pdf(self):
+        return self.path.lower().endswith('.pdf')
+
+    @property
+    def key(self):
+        """Identify this sheet so cached results survive reloading it."""
+        dpi = self.dpi if self.is_pdf else None
+        return sheet_key(self.path) + (self.page, dpi)
+
+    @property
+    def label(self):
+        name = os.path.basename(self.path)
+        if self.page is None:
+            return name
+        return f"{name} [{self.page + 1}/{self.page_count}]"
+
+    def open(self):
+        """Decode the frame or render the page at self.dpi."""
+        from PIL import Image
+
+        if self.is_pdf:
+            with _pdfium_lock:
+                page = _open_pdf(self.path)[self.page or 0]
+                try:
+                    return page.render(scale=self.dpi / 72).to_pil()
+                finally:
+                    page.close()
+
+        image = Image.open(self.path)
+        if self.page:
+            image.seek(self.page)
+        image.load()
+        return image.copy() if self.page is not None else image
+
+    def render_region(self, box, dpi):
+        """Re-render a box (in pixels of the self.dpi render) of a PDF page at dpi.
+
+        Only the region is rasterized, so memory and time scale with the
+        area extracted rather than the page. Returns None if the page can't
+        be rendered that way (not a PDF, or a rotated page).
+        """
+        if not self.is_pdf:
+            return None
+        x1, y1, x2, y2 = box
+        to_points = 72 / self.dpi
+        with _pdfium_lock:
+            page = _open_pdf(self.path)[self.page or 0]
+            try:
+                if page.get_rotation():
+                    return None
+                page_w, page_h = page.get_size()
+                # pdfium crops are amounts trimmed from (left, bottom, right, top)
+                crop = (x1 * to_points, page_h - y2 * to_points,
+                        page_w - x2 * to_points, y1 * to_points)
+                image = page.render(scale=dpi / 72, crop=crop).to_pil()
+            finally:
+                page.close()
+
+        # Rounding in the renderer can be off by a pixel; match the expected size
+        scale = dpi / self.dpi
+        size = (max(1, round((x2 - x1) * scale)), max(1, round((y2 - y1) * scale)))
+        if image.size != size:
+            from PIL import Image
+            image = image.resize(size, Image.Resampling.BICUBIC)
+        return image
+
+
+def as_sheet_source(source):
+    return source if isinstance(source, SheetSource) else SheetSource(source)
+
+
+def iter_sheet_sources(path, dpi=DEFAULT_PDF_DPI):
+    """Yield one SheetSource per page of a PDF, frame of a TIFF, or the image itself."""
+    lower = path.lower()
+    if lower.endswith('.pdf'):
+        with _pdfium_lock:
+            count = len(_open_pdf(path))
+        for page in range(count):
+            yield SheetSource(path, page, count, dpi)
+        return
+
+    if lower.endswith(('.tif', '.tiff')):
+        from PIL import Image
+
+        with Image.open(path) as image:
+            count = getattr(image, "n_frames", 1)
+        if count > 1:
+            for frame in range(count):
+                yield SheetSource(path, frame, count)
+            return
+
+    yield SheetSource(path)
+
+
+def open_sheet(source, deskew=True):
+    """Decode a sheet fully and deskew it; returns (working image, skew angle)."""
+    source = as_sheet_source(source)
+    image = canonical_rgb(source.open())
+    angle = 0.0
+    if deskew:
+        image, angle = normalize_sheet(image, key=source.key)
+    return image, angle
+
+
+def load_sheet(source, deskew=True):
+    """Open a sheet for display: returns (working image, display pyramid, skew angle)."""
+    image, angle = open_sheet(source, deskew)
+    return image, build_pyramid(image), angle
+
+
+def list_sheet_files(folder):
+    """Return the image and PDF files in a folder, sorted by name."""
+    return sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if name.lower().endswith(SHEET_EXTENSIONS)
+        and os.path.isfile(os.path.join(folder, name))
+    )
+
+
+def expand_sources(paths, dpi=DEFAULT_PDF_DPI):
+    """Lazily yield a SheetSource for every page/frame of the given files and folders."""
+    for path in paths:
+        files = list_sheet_files(path) if os.path.isdir(path) else [path]
+        for file_path in files:
+            yield from iter_sheet_sources(file_path, dpi)
+
+
+def fit_edge(profile, start):
+    """Locate the strongest transition in a 1-D color profile to sub-pixel precision.
+
+    Returns (position, half_width, strength) in image pixel units, or None
+    if the profile is too short. The position is refined with a parabola
+    through the gradient peak; half_width is half the span of samples above
+    half the peak gradient, i.e. how far the edge is blurred.
+    """
+    grads = [sum(abs(a - b) for a, b in zip(p, q)) for p, q in zip(profile, profile[1:])]
+    if len(grads) < 3:
+        return None
+    i = max(range(len(grads)), key=grads.__getitem__)
+    peak = grads[i]
+
+    offset = 0.0
+    if 0 < i < len(grads) - 1:
+        denom = grads[i - 1] - 2 * peak + grads[i + 1]
+        if denom:
+            offset = 0.5 * (grads[i - 1] - grads[i + 1]) / denom
+
+    lo = i
+    while lo > 0 and grads[lo - 1] > peak / 2:
+        lo -= 1
+    hi = i
+    while hi < len(grads) - 1 and grads[hi + 1] > peak / 2:
+        hi += 1
+
+    # Gradient sample i sits between pixels start + i and start + i + 1
+    return start + i + 0.5 + offset, (hi - lo + 1) / 2, peak
+
+
+def _edge_profile(image, vertical, position, span_start, span_end, band):
+    """Mean RGB profile across an edge, averaged over the middle of its length."""
+    from PIL import Image
+
+    width, height = image.size
+    limit = width if vertical else height
+    start = max(0, int(position) - band)
+    end = min(limit, int(position) + band + 1)
+    if end - start < 4 or span_end <= span_start:
+        return None, start
+    if vertical:
+        strip = image.crop((start, span_start, end, span_end))
+        size = (end - start, 1)
+    else:
+        strip = image.crop((span_start, start, span_end, end))
+        size = (1, end - start)
+    data = strip.convert('RGB').resize(size, Image.Resampling.BOX).tobytes()
+    return [tuple(data[i:i + 3]) for i in range(0, len(data), 3)], start
+
+
+def refine_bounds(image, edges, fallback, band=None, min_contrast=12):
+    """Fit each edge of a coarse box to sub-pixel precision.
+
+    edges are the coarse (left, top, right, bottom) transition positions;
+    only a band of +/- band pixels around each one is sampled. Returns a
+    crop box (right/bottom exclusive) that excludes blurred border pixels.
+    Edges without a clear transition keep their value from fallback.
+    """
+    left, top, right, bottom = edges
+    box_w, box_h = right - left, bottom - top
+    if band is None:
+        band = max(3, min(12, int(min(box_w, box_h)) // 10))
+
+    # Sample along the middle half of each edge so corners don't blur the fit
+    row_span = (int(top + box_h / 4), int(bottom - box_h / 4) + 1)
+    col_span = (int(left + box_w / 4), int(right - box_w / 4) + 1)
+
+    refined = list(fallback)
+    for index, (vertical, position, span) in enumerate((
+            (True, left, row_span), (False, top, col_span),
+            (True, right, row_span), (False, bottom, col_span))):
+        profile, start = _edge_profile(image, vertical, position, span[0], span[1], band)
+        fit = fit_edge(profile, start) if profile else None
+        if fit is None or fit[2] < min_contrast:
+            continue
+        edge, half_width, _ = fit
+        if index < 2:
+            refined[index] = math.ceil(edge + half_width)
+        else:
+            refined[index] = math.floor(edge - half_width) + 1
+
+    if refined[2] - refined[0] < 1 or refined[3] - refined[1] < 1:
+        return tuple(fallback)
+    return tuple(refined)
+
+
+DEDUP_MODES = ("off", "report", "link")
+
+
+def swatch_fingerprint(image):
+    """Compute a compact perceptual and color hash of a swatch crop.
+
+    Returns a dict with a 64-bit difference hash of the luminance, a 4x4
+    grid of mean colors, the exact mean color and size of the crop, and
+    whether the crop is textured (solid swatches are compared on color
+    alone, since their dhash is just noise).
+    """
+    from PIL import Image, ImageStat
+
+    rgb = image.convert('RGB')
+    mean = [round(value, 2) for value in ImageStat.Stat(rgb).mean]
+    small = rgb.resize((64, 64), Image.Resampling.BOX)
+    gray = small.convert('L')
+
+    pixels = gray.resize((9, 8), Image.Resampling.BOX).tobytes()
+    dhash = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            dhash = (dhash << 1) | (1 if left > right else 0)
+
+    return {
+        "dhash": f"{dhash:016x}",
+        "colors": small.resize((4, 4), Image.Resampling.BOX).tobytes().hex(),
+        "mean": mean,
+        "size": list(rgb.size),
+        "textured": ImageStat.Stat(gray).stddev[0] > 6.0,
+    }
+
+
+def png_fingerprint(data):
+    """Fingerprint a swatch from its encoded PNG bytes."""
+    import io
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        return swatch_fingerprint(image)
+
+
+def fingerprints_match(a, b, color_tolerance=6.0, max_hamming=10):
+    """Return True if two swatch fingerprints describe the same swatch."""
+    if a["textured"] != b["textured"]:
+        return False
+    colors_a = bytes.fromhex(a["colors"])
+    colors_b = bytes.fromhex(b["colors"])
+    color_diff = sum(abs(p - q) for p, q in zip(colors_a, colors_b)) / len(colors_a)
+    if color_diff > color_tolerance:
+        return False
+    if a["textured"]:
+        hamming = bin(int(a["dhash"], 16) ^ int(b["dhash"], 16)).count("1")
+        return hamming <= max_hamming
+    return True
+
+
+def fingerprints_identical(a, b, mean_tolerance=1.0):
+    """Return True if two fingerprints are close enough to share one file.
+
+    Stricter than fingerprints_match: the crops must have the same size and
+    mean colors within about one level per channel, so a neighbouring shade
+    is never hard-linked in place of the swatch that was clicked.
+    """
+    if "mean" not in a or "mean" not in b or a.get("size") != b.get("size"):
+        return False
+    if any(abs(p - q) > mean_tolerance for p, q in zip(a["mean"], b["mean"])):
+        return False
+    return fingerprints_match(a, b)
+
+
+def _fingerprint_mean(fingerprint):
+    """Mean color of a fingerprint (estimated from the grid for old index entries)."""
+    if "mean" in fingerprint:
+        return fingerprint["mean"]
+    colors = bytes.fromhex(fingerprint["colors"])
+    cells = len(colors) // 3
+    return [sum(colors[channel::3]) / cells for channel in range(3)]
+
+
+class SwatchIndex:
+    """On-disk index of swatch fingerprints for one output directory.
+
+    Entries are bucketed by quantized mean color, so a lookup only compares
+    against swatches of a similar color. Changes are kept in memory and
+    written by flush(), once per batch of saves and on exit.
+    """
+
+    FILENAME = ".swatch_index.json"
+    BUCKET_SIZE = 32  # Wider than any per-channel mean difference fingerprints_match allows
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, self.FILENAME)
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.buckets = {}
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        import json
+
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f).get("swatches", {})
+        except (OSError, ValueError) as e:
+            print(f"Could not read swatch index {self.path}: {e}", file=sys.stderr)
+            self.entries = {}
+        for filename, entry in self.entries.items():
+            if not entry.get("duplicate_of"):
+                self._bucket(entry).add(filename)
+
+    def save(self):
+        import json
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "swatches": self.entries}, f,
+                      separators=(",", ":"), sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def flush(self):
+        """Write the index if it changed since the last write."""
+        with self.lock:
+            if self.dirty:
+                self.save()
+                self.dirty = False
+
+    def _bucket_key(self, fingerprint):
+        return tuple(int(value // self.BUCKET_SIZE) for value in _fingerprint_mean(fingerprint))
+
+    def _bucket(self, fingerprint):
+        return self.buckets.setdefault(self._bucket_key(fingerprint), set())
+
+    def _unbucket(self, filename):
+        entry = self.entries.get(filename)
+        if entry is not None:
+            self.buckets.get(self._bucket_key(entry), set()).discard(filename)
+
+    def find_duplicate(self, fingerprint, exclude=None, exact=False):
+        """Return the filename of a stored swatch matching the fingerprint.
+
+        With exact=True only a swatch close enough to share a file counts
+        (see fingerprints_identical); otherwise fingerprints_match decides.
+        """
+        match = fingerprints_identical if exact else fingerprints_match
+        r, g, b = self._bucket_key(fingerprint)
+        with self.lock:
+            candidates = set()
+            for dr in (-1, 0, 1):
+                for dg in (-1, 0, 1):
+                    for db in (-1, 0, 1):
+                        candidates |= self.buckets.get((r + dr, g + dg, b + db), set())
+            for filename in sorted(candidates):
+                if filename == exclude:
+                    continue
+                if not match(fingerprint, self.entries[filename]):
+                    continue
+                if os.path.exists(os.path.join(self.directory, filename)):
+                    return filename
+        return None
+
+    def add(self, filename, fingerprint, duplicate_of=None):
+        with self.lock:
+            self._unbucket(filename)
+            self.entries[filename] = dict(fingerprint, duplicate_of=duplicate_of)
+            if not duplicate_of:
+                self._bucket(fingerprint).add(filename)
+            self.dirty = True
+
+    def remove(self, filename):
+        with self.lock:
+            self._unbucket(filename)
+            if self.entries.pop(filename, None) is not None:
+                self.dirty = True
+
+    def rename(self, old_filename, new_filename):
+        with self.lock:
+            self._unbucket(old_filename)
+            entry = self.entries.pop(old_filename, None)
+            if entry is None:
+                return
+            self.entries[new_filename] = entry
+            if not entry.get("duplicate_of"):
+                self._bucket(entry).add(new_filename)
+            for other in self.entries.values():
+                if other.get("duplicate_of") == old_filename:
+                    other["duplicate_of"] = new_filename
+            self.dirty = True
+
+    def duplicates(self):
+        """Return {stored filename: [duplicate filenames]}."""
+        with self.lock:
+            groups = {}
+            for filename, entry in self.entries.items():
+                if entry.get("duplicate_of"):
+                    groups.setdefault(entry["duplicate_of"], []).append(filename)
+            return groups
+
+
+_swatch_indexes = {}
+_swatch_indexes_lock = threading.Lock()
+
+
+def get_swatch_index(directory):
+    """Return the process-wide SwatchIndex for a directory."""
+    key = os.path.abspath(directory)
+    with _swatch_indexes_lock:
+        if key not in _swatch_indexes:
+            if not _swatch_indexes:
+                import atexit
+                atexit.register(flush_swatch_indexes)
+            _swatch_indexes[key] = SwatchIndex(directory)
+        return _swatch_indexes[key]
+
+
+def flush_swatch_indexes():
+    """Write every swatch index with unsaved changes."""
+    with _swatch_indexes_lock:
+        indexes = list(_swatch_indexes.values())
+    for index in indexes:
+        try:
+            index.flush()
+        except OSError as e:
+            print(f"Could not write swatch index {index.path}: {e}", file=sys.stderr)
+
+
+def link_or_copy(source, destination):
+    """Hard-link destination to source; return False if linking is not possible."""
+    try:
+        if os.path.lexists(destination):
+            os.remove(destination)
+        os.link(source, destination)
+        return True
+    except OSError:
+        return False
+
+
+def store_swatch(swatch, record, output_dir, output, dedup_mode="off"):
+    """Write a swatch crop and publish its record; the UI-free half of saving.
+
+    The crop goes to the output's sink if it has one, otherwise to
+    <output_dir>/<name>.png, checked against the directory's SwatchIndex
+    unless dedup_mode is "off" (a repeat is hard-linked in "link" mode).
+    Fills in record["file"] and record["duplicate_of"]. Returns
+    (file path or None, status message).
+    """
+    filename = f"{record['name']}.png"
+    filepath = os.path.join(output_dir, filename)
+
+    if output.sink is not None:
+        # Sinks take the place of loose files (and of dedup linking)
+        message = f"Saved: {filename}" if output.removable else f"Saved: {filename} (archive, can't be undone)"
+        filepath = None
+    elif dedup_mode == "off":
+        if os.path.exists(filepath) and os.stat(filepath).st_nlink > 1:
+            os.remove(filepath)
+        swatch.save(filepath)
+        message = f"Saved: {filename}"
+    else:
+        index = get_swatch_index(output_dir)
+        fingerprint = swatch_fingerprint(swatch)
+        # Linking shares one file, so it needs a stricter match than reporting
+        original = index.find_duplicate(fingerprint, exclude=filename, exact=dedup_mode == "link")
+        linked = (original is not None and dedup_mode == "link"
+                  and link_or_copy(os.path.join(output_dir, original), filepath))
+        if not linked:
+            if os.path.exists(filepath) and os.stat(filepath).st_nlink > 1:
+                # Never write through a hard link into another swatch's file
+                os.remove(filepath)
+            swatch.save(filepath)
+        index.add(filename, fingerprint, duplicate_of=original)
+
+        if original is None:
+            message = f"Saved: {filename}"
+        else:
+            action = "Linked" if linked else "Saved"
+            message = f"{action}: {filename} (duplicate of {original})"
+        record["duplicate_of"] = original
+
+    if filepath is not None:
+        record["file"] = filepath
+    output.emit(record, swatch)
+    if isinstance(output.sink, DirectorySink):
+        filepath = record["file"]  # A loose file after all, so undo can delete it
+    return filepath, message
+
+
+class SheetPreloader:
+    """Decode sheets and build their pyramids on a background thread."""
+
+    def __init__(self, keep=2, deskew=True):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="preload")
+        self.futures = OrderedDict()
+        self.keep = keep
+        self.deskew = deskew
+
+    def preload(self, source):
+        """Start loading a sheet in the background if not already queued."""
+        source = as_sheet_source(source)
+        if source.key in self.futures:
+            self.futures.move_to_end(source.key)
+            return
+        future = self.executor.submit(load_sheet, source, self.deskew)
+        self.futures[source.key] = future
+        future.add_done_callback(lambda f, key=source.key: self._track(key, f))
+        # Only hold on to a few decoded sheets ahead of time
+        while len(self.futures) > self.keep:
+            self.discard(next(iter(self.futures)))
+
+    def _track(self, key, future):
+        if future.cancelled() or future.exception() is not None or self.futures.get(key) is not future:
+            return
+        image, pyramid, _ = future.result()
+        MEMORY.track(("preload", key), sum(image_nbytes(level) for level in pyramid),
+                     evict=lambda: self.discard(key))
+
+    def discard(self, key):
+        """Forget a preloaded sheet (it is decoded again if needed)."""
+        future = self.futures.pop(key, None)
+        if future is not None:
+            future.cancel()
+        MEMORY.release(("preload", key))
+
+    def get(self, source):
+        """Return (image, pyramid, angle), waiting on a preload or loading directly."""
+        source = as_sheet_source(source)
+        future = self.futures.pop(source.key, None)
+        MEMORY.release(("preload", source.key))  # Its viewer tracks it from now on
+        if future is not None and not future.cancelled():
+            return future.result()
+        return load_sheet(source, self.deskew)
+
+    def shutdown(self):
+        for key in list(self.futures):
+            self.discard(key)
+        self.executor.shutdown(wait=False)
 
-try:
-    import pytesseract
-    import os
-    if os.name == 'nt':  # Windows
-        possible_paths = [
-            r"C:\Program Files\Tesseract-OCR\tesseract.exe",
-            r"C:\Program Files (x86)\Tesseract-OCR\tesseract.exe",
-        ]
-        for path in possible_paths:
-            if os.path.exists(path):
-                pytesseract.pytesseract.tesseract_cmd = path
-                break
-    HAS_OCR = True
-except ImportError:
-    HAS_OCR = False
 
 class ImageViewer:
     """Simple image viewer with zoom and pan."""
-    
-    def __init__(self, parent, image):
+
+    def __init__(self, parent, image, pyramid=None):
         self.parent = parent
         self.original_image = image
+        self.pyramid = pyramid or [image]
         self.img_width, self.img_height = image.size
+
+        # The original is needed for detection; reduced levels can be rebuilt
+        MEMORY.track((id(self), "original"), image_nbytes(image))
+        self.pyramid_evicted = False
+        self._track_pyramid()
         
         # Zoom settings
         self.zoom_level = 1.0
@@ -44,8 +1019,8 @@ class ImageViewer:
         # Calculate initial zoom to fit
         self.fit_to_window()
         
-        self.current_image = None
         self.photo = None
+        self.rendered = None  # Zoomed-sheet rect of the current render
         
     def fit_to_window(self):
         """Calculate zoom to fit entire image in window."""
@@ -59,17 +1034,76 @@ class ImageViewer:
         self.offset_x = (self.canvas_width - display_w) // 2
         self.offset_y = (self.canvas_height - display_h) // 2
         
-    def get_display_image(self):
-        """Get the image at current zoom level."""
-        new_width = int(self.img_width * self.zoom_level)
-        new_height = int(self.img_height * self.zoom_level)
-        
-        if new_width < 1 or new_height < 1:
-            new_width = max(1, new_width)
-            new_height = max(1, new_height)
-            
-        self.current_image = self.original_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-        return self.current_image
+    def _visible_rect(self, view_width, view_height, margin_x=0, margin_y=0):
+        """The viewport (plus margins) in zoomed-sheet pixels, clipped to the sheet."""
+        full_w = max(1, int(self.img_width * self.zoom_level))
+        full_h = max(1, int(self.img_height * self.zoom_level))
+        return (max(0, -self.offset_x - margin_x), max(0, -self.offset_y - margin_y),
+                min(full_w, -self.offset_x + view_width + margin_x),
+                min(full_h, -self.offset_y + view_height + margin_y))
+
+    def covers_view(self, view_width, view_height):
+        """True if the last render still covers everything on screen."""
+        if self.rendered is None:
+            return False
+        left, top, right, bottom = self._visible_rect(view_width, view_height)
+        if right <= left or bottom <= top:
+            return True  # Nothing of the sheet is on screen
+        r_left, r_top, r_right, r_bottom = self.rendered
+        return r_left <= left and r_top <= top and right <= r_right and bottom <= r_bottom
+
+    def get_display_image(self, view_width=None, view_height=None):
+        """Render the sheet around the viewport at the current zoom.
+
+        Only the visible region plus half a viewport on each side is
+        resampled, so the buffer stays about four viewports in size however
+        far the sheet is zoomed in. Returns (image, x, y), where x, y is the
+        screen position of the image's top-left corner.
+        """
+        view_width = view_width or self.canvas_width
+        view_height = view_height or self.canvas_height
+        full_w = max(1, int(self.img_width * self.zoom_level))
+        full_h = max(1, int(self.img_height * self.zoom_level))
+        left, top, right, bottom = self._visible_rect(view_width, view_height,
+                                                      view_width // 2, view_height // 2)
+        if right <= left or bottom <= top:
+            left, top, right, bottom = 0, 0, 1, 1  # Panned off the sheet
+
+        from PIL import Image
+
+        if self.pyramid_evicted and full_w * 2 <= self.img_width:
+            # Zoomed out, the evicted reduced levels pay for themselves again
+            self.pyramid = build_pyramid(self.original_image)
+            self.pyramid_evicted = False
+            self._track_pyramid()
+        MEMORY.touch((id(self), "pyramid"))
+
+        # Resample from the smallest pyramid level that is still large enough
+        source = self.pyramid[0]
+        for level in reversed(self.pyramid):
+            if level.width >= full_w and level.height >= full_h:
+                source = level
+                break
+
+        fx, fy = source.width / full_w, source.height / full_h
+        self.rendered = (left, top, right, bottom)
+        # Not kept: the PhotoImage made from it is the only display buffer
+        region = source.resize((right - left, bottom - top), Image.Resampling.LANCZOS,
+                               box=(left * fx, top * fy, right * fx, bottom * fy))
+        return region, self.offset_x + left, self.offset_y + top
+
+    def _track_pyramid(self):
+        if len(self.pyramid) > 1:
+            MEMORY.track((id(self), "pyramid"), sum(image_nbytes(level) for level in self.pyramid[1:]),
+                         evict=self.drop_pyramid)
+
+    def drop_pyramid(self):
+        self.pyramid = [self.original_image]
+        self.pyramid_evicted = True
+
+    def release_memory(self):
+        for kind in ("original", "pyramid", "photo"):
+            MEMORY.release((id(self), kind))
     
     def screen_to_image(self, screen_x, screen_y):
         """Convert screen coordinates to original image coordinates."""
@@ -113,22 +1147,827 @@ class ImageViewer:
         self.offset_y += dy
 
 
-class SwatchExtractor:
-    def __init__(self, root, image_path):
-        self.root = root
-        self.root.title("Color Swatch Extractor")
+class SwatchDetector:
+    """Swatch detection and OCR on one sheet, independent of the Tk UI.
+
+    SwatchExtractor drives it from mouse clicks; the extraction service and
+    batch modes drive it from layout templates.
+    """
+
+    def __init__(self, image, key=None, skew_angle=0.0, shared=None, source=None,
+                 output_dpi=DEFAULT_OUTPUT_DPI, detect_scale=1):
+        self.image = canonical_rgb(image)  # A no-op for sheets from open_sheet
+        self.width, self.height = image.size
+        # Detection runs on the 8-bit RGB sheet, optionally downsampled by
+        # detect_scale; bounds are mapped back and refined on self.image
+        self.detect_scale = max(1, int(detect_scale))
+        self._work = None
+        self.sheet_key = key
+        self.skew_angle = skew_angle
+        self.shared = shared if shared is not None else SHARED_CACHE
+        self.refine_edges = True  # Sub-pixel edge fitting of detected bounds
+        self.threshold = 30  # L1 color distance that still counts as the same swatch
+        self.auto_threshold = False  # Pick the threshold per click from local noise
+        self.last_threshold = None
+        self._noise = {}  # (cell x, cell y) -> estimated L1 noise
+        # Vector sources (PDF pages) re-render crops at output_dpi
+        self.source = source
+        self.output_dpi = output_dpi
+
+    @property
+    def work(self):
+        """The detection working image, reduced on first use."""
+        if self._work is None:
+            work = self.image
+            if self.detect_scale > 1:
+                work = work.reduce(self.detect_scale)
+            self._work = work
+        return self._work
+
+    def set_detect_scale(self, detect_scale):
+        detect_scale = max(1, int(detect_scale))
+        if detect_scale != self.detect_scale:
+            self.detect_scale = detect_scale
+            self._work = None
+            self._noise.clear()
+
+    def contains(self, x, y):
+        """True if a sheet-coordinate point lies on the sheet."""
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def clamp_box(self, box):
+        """Clamp a sheet-coordinate box to the sheet."""
+        x1, y1, x2, y2 = box
+        return (min(max(0, x1), self.width), min(max(0, y1), self.height),
+                min(max(0, x2), self.width), min(max(0, y2), self.height))
+
+    def _to_work(self, x, y):
+        s = self.detect_scale
+        work = self.work
+        return min(max(0, int(x) // s), work.width - 1), min(max(0, int(y) // s), work.height - 1)
+
+    def _refine(self, edges, fallback):
+        """Refine coarse sheet-coordinate edges on the full-resolution image.
+
+        The result is clamped to the sheet, so a crop is never padded.
+        """
+        fallback = self.clamp_box(fallback)
+        if not self.refine_edges:
+            return fallback
+        s = self.detect_scale
+        return self.clamp_box(refine_bounds(self.image, edges, fallback, band=2 * s if s > 1 else None))
+
+    def crop(self, box, high_res=True):
+        """Crop a box of the working image; returns (image, scale).
+
+        For PDF pages the box is re-rendered at output_dpi instead, and
+        scale is the resulting pixels per working-image pixel. Deskewed
+        pages are cropped from the working image, since the box is in
+        rotated coordinates.
+        """
+        box = tuple(int(v) for v in box)
+        source = self.source
+        if (high_res and source is not None and source.is_pdf and not self.skew_angle
+                and self.output_dpi and self.output_dpi > source.dpi):
+            region = source.render_region(box, self.output_dpi)
+            if region is not None:
+                return region, self.output_dpi / source.dpi
+        return self.image.crop(box), 1.0
+
+    NOISE_CELL = 64
+
+    def estimate_noise(self, x, y):
+        """Estimate the L1 pixel noise of the sheet region around a point.
+
+        Uses the median absolute difference between pixels two apart
+        horizontally in the surrounding grid cell, summed over channels;
+        edges and text only touch a minority of pixels, so they barely move
+        the median. The two-pixel lag reaches past JPEG smoothing, which
+        hides noise from adjacent differences. Cached per cell.
+        """
+        x, y = self._to_work(x, y)
+        cell = (x // self.NOISE_CELL, y // self.NOISE_CELL)
+        noise = self._noise.get(cell)
+        if noise is None:
+            from PIL import ImageChops, ImageStat
+
+            work = self.work
+            left = cell[0] * self.NOISE_CELL
+            top = cell[1] * self.NOISE_CELL
+            patch = work.crop((left, top, min(left + self.NOISE_CELL + 2, work.width),
+                               min(top + self.NOISE_CELL, work.height)))
+            if patch.width < 3:
+                noise = 0.0
+            else:
+                diff = ImageChops.difference(patch.crop((2, 0, patch.width, patch.height)),
+                                             patch.crop((0, 0, patch.width - 2, patch.height)))
+                noise = float(sum(ImageStat.Stat(diff).median))
+            self._noise[cell] = noise
+        return noise
+
+    def choose_threshold(self, x, y, low=20, high=90):
+        """Pick a color-match threshold for a click from the local noise level."""
+        return int(max(low, min(high, 10 + 6 * self.estimate_noise(x, y))))
+
+    def find_color_boundaries(self, click_x, click_y, threshold=None):
+        """Grow a solid swatch from a click; None if the click is off the sheet."""
+        if not self.contains(click_x, click_y):
+            return None
+        if threshold is None:
+            threshold = self.choose_threshold(click_x, click_y) if self.auto_threshold else self.threshold
+        self.last_threshold = threshold
+        s = self.detect_scale
+        work = self.work
+        width, height = work.size
+        cx, cy = self._to_work(click_x, click_y)
+        pixels = work.load()
+        center_color = pixels[cx, cy]
+        if self.auto_threshold:
+            # On noisy scans compare against the local mean, not one noisy pixel
+            from PIL import ImageStat
+
+            patch = work.crop((max(0, cx - 2), max(0, cy - 2), min(width, cx + 3), min(height, cy + 3)))
+            center_color = tuple(ImageStat.Stat(patch).mean)
         
-        # Load image
-        self.original_image = Image.open(image_path)
-        self.viewer = ImageViewer(root, self.original_image)
+        def color_matches(x, y):
+            if x < 0 or y < 0 or x >= width or y >= height:
+                return False
+            pixel = pixels[x, y]
+            diff = sum(abs(pixel[i] - center_color[i]) for i in range(3))
+            return diff < threshold
         
-        # State
-        self.selection_enabled = False
-        self.texture_mode = False  # For textured swatches
-        self.text_offset_from_color_x1 = None
-        self.text_offset_from_color_y1 = None
-        self.text_width = None
-        self.text_height = None
+        x1 = cx
+        while x1 > 0 and color_matches(x1 - 1, cy):
+            x1 -= 1
+        
+        x2 = cx
+        while x2 < width - 1 and color_matches(x2 + 1, cy):
+            x2 += 1
+        
+        y1 = cy
+        while y1 > 0 and color_matches(cx, y1 - 1):
+            y1 -= 1
+        
+        y2 = cy
+        while y2 < height - 1 and color_matches(cx, y2 + 1):
+            y2 += 1
+        
+        # Downsampled edge pixels may straddle the border, so inset further
+        margin = 2 + (s - 1)
+        fallback = (min(x1 * s + margin, click_x), min(y1 * s + margin, click_y),
+                    max((x2 + 1) * s - 1 - margin, click_x), max((y2 + 1) * s - 1 - margin, click_y))
+
+        # Transitions lie half a pixel outside the last matching pixels
+        return self._refine((x1 * s - 0.5, y1 * s - 0.5, (x2 + 1) * s - 0.5, (y2 + 1) * s - 0.5), fallback)
+    
+    def find_textured_swatch_boundaries(self, click_x, click_y):
+        """Find boundaries of textured swatches using enhanced edge detection.
+
+        Returns None if the click is off the sheet.
+        """
+        if not self.contains(click_x, click_y):
+            return None
+        s = self.detect_scale
+        work = self.work
+        pixels = work.load()
+        width, height = work.size
+        sheet_x, sheet_y = click_x, click_y
+        click_x, click_y = self._to_work(click_x, click_y)
+        
+        # Get a larger sample of colors around click point to understand the texture
+        sample_radius = max(3, 15 // s)
+        sample_step = 2 if s == 1 else 1
+        color_samples = []
+        for dy in range(-sample_radius, sample_radius + 1, sample_step):
+            for dx in range(-sample_radius, sample_radius + 1, sample_step):
+                sx = click_x + dx
+                sy = click_y + dy
+                if 0 <= sx < width and 0 <= sy < height:
+                    color_samples.append(pixels[sx, sy])
+        
+        if not color_samples:
+            return self.find_color_boundaries(sheet_x, sheet_y)
+        
+        # Calculate average color for the texture
+        avg_r = sum(c[0] for c in color_samples) / len(color_samples)
+        avg_g = sum(c[1] for c in color_samples) / len(color_samples)
+        avg_b = sum(c[2] for c in color_samples) / len(color_samples)
+        
+        # Calculate standard deviation
+        variance = sum(
+            (c[0] - avg_r)**2 + (c[1] - avg_g)**2 + (c[2] - avg_b)**2 
+            for c in color_samples
+        ) / len(color_samples)
+        std_dev = variance ** 0.5
+        
+        # More generous threshold for textured swatches
+        texture_threshold = max(70, min(140, std_dev * 3.5))
+        
+        def texture_matches(x, y):
+            """Check if pixel is part of the textured swatch."""
+            if x < 0 or y < 0 or x >= width or y >= height:
+                return False
+            pixel = pixels[x, y]
+            # Use Euclidean distance in color space
+            diff = ((pixel[0] - avg_r)**2 + (pixel[1] - avg_g)**2 + (pixel[2] - avg_b)**2) ** 0.5
+            return diff < texture_threshold
+        
+        # Use flood fill with limits to prevent freezing
+        visited = set()
+        queue = [(click_x, click_y)]
+        min_x, max_x = click_x, click_x
+        min_y, max_y = click_y, click_y
+        pixel_count = 0
+        max_pixels = 100000  # Safety limit to prevent freezing
+        
+        while queue and pixel_count < max_pixels:
+            x, y = queue.pop(0)
+            if (x, y) in visited:
+                continue
+            if not texture_matches(x, y):
+                continue
+                
+            visited.add((x, y))
+            pixel_count += 1
+            
+            # Update bounding box on the fly
+            min_x = min(min_x, x)
+            max_x = max(max_x, x)
+            min_y = min(min_y, y)
+            max_y = max(max_y, y)
+            
+            # Check 4-connected neighbors
+            for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
+                nx, ny = x + dx, y + dy
+                if (nx, ny) not in visited and 0 <= nx < width and 0 <= ny < height:
+                    queue.append((nx, ny))
+        
+        if pixel_count == 0:
+            return self.find_color_boundaries(sheet_x, sheet_y)
+        
+        x1, x2 = min_x, max_x
+        y1, y2 = min_y, max_y
+        
+        # Small margin adjustment
+        margin = 2
+        fallback = (max(0, x1 * s - margin), max(0, y1 * s - margin),
+                    min(self.width - 1, (x2 + 1) * s - 1 + margin),
+                    min(self.height - 1, (y2 + 1) * s - 1 + margin))
+
+        return self._refine((x1 * s - 0.5, y1 * s - 0.5, (x2 + 1) * s - 0.5, (y2 + 1) * s - 0.5), fallback)
+    
+    def find_swatch_in_region(self, region_x1, region_y1, region_x2, region_y2):
+        """Find actual swatch boundaries within the user-drawn region using edge detection."""
+        s = self.detect_scale
+        work = self.work
+        pixels = work.load()
+        width, height = work.size
+        
+        # Ensure coordinates are within bounds and integers (in working-image pixels)
+        region_x1, region_y1 = self._to_work(region_x1, region_y1)
+        region_x2, region_y2 = self._to_work(region_x2, region_y2)
+        search_limit = max(3, 50 // s)
+        
+        # Find the strongest vertical edges (likely swatch borders)
+        # Scan from left - look for strongest vertical edge
+        best_left = region_x1
+        max_edge_strength = 0
+        search_range = min(search_limit, (region_x2 - region_x1) // 2)
+        for x in range(region_x1, min(region_x1 + search_range, region_x2)):
+            edge_strength = 0
+            for y in range(region_y1, region_y2):
+                if x > 0 and x < width - 1:
+                    left_color = pixels[x - 1, y]
+                    right_color = pixels[x + 1, y]
+                    diff = sum(abs(left_color[i] - right_color[i]) for i in range(3))
+                    edge_strength += diff
+            if edge_strength > max_edge_strength:
+                max_edge_strength = edge_strength
+                best_left = x
+        
+        # Scan from right - look for strongest vertical edge
+        best_right = region_x2
+        max_edge_strength = 0
+        search_range = min(search_limit, (region_x2 - region_x1) // 2)
+        for x in range(region_x2, max(region_x2 - search_range, region_x1), -1):
+            edge_strength = 0
+            for y in range(region_y1, region_y2):
+                if x > 0 and x < width - 1:
+                    left_color = pixels[x - 1, y]
+                    right_color = pixels[x + 1, y]
+                    diff = sum(abs(left_color[i] - right_color[i]) for i in range(3))
+                    edge_strength += diff
+            if edge_strength > max_edge_strength:
+                max_edge_strength = edge_strength
+                best_right = x
+        
+        # Find the strongest horizontal edges
+        # Scan from top - look for strongest horizontal edge
+        best_top = region_y1
+        max_edge_strength = 0
+        search_range = min(search_limit, (region_y2 - region_y1) // 2)
+        for y in range(region_y1, min(region_y1 + search_range, region_y2)):
+            edge_strength = 0
+            for x in range(region_x1, region_x2):
+                if y > 0 and y < height - 1:
+                    top_color = pixels[x, y - 1]
+                    bottom_color = pixels[x, y + 1]
+                    diff = sum(abs(top_color[i] - bottom_color[i]) for i in range(3))
+                    edge_strength += diff
+            if edge_strength > max_edge_strength:
+                max_edge_strength = edge_strength
+                best_top = y
+        
+        # Scan from bottom - look for strongest horizontal edge
+        best_bottom = region_y2
+        max_edge_strength = 0
+        search_range = min(search_limit, (region_y2 - region_y1) // 2)
+        for y in range(region_y2, max(region_y2 - search_range, region_y1), -1):
+            edge_strength = 0
+            for x in range(region_x1, region_x2):
+                if y > 0 and y < height - 1:
+                    top_color = pixels[x, y - 1]
+                    bottom_color = pixels[x, y + 1]
+                    diff = sum(abs(top_color[i] - bottom_color[i]) for i in range(3))
+                    edge_strength += diff
+            if edge_strength > max_edge_strength:
+                max_edge_strength = edge_strength
+                best_bottom = y
+        
+        # The best columns/rows are centred on the transition itself
+        fallback = tuple(v * s + (s - 1) // 2 for v in (best_left, best_top, best_right, best_bottom))
+        return self._refine(fallback, fallback)
+    
+    def extract_text_from_box(self, x1, y1, x2, y2):
+        if not has_ocr():
+            return None
+        
+        x1, x2 = min(x1, x2), max(x1, x2)
+        y1, y2 = min(y1, y2), max(y1, y2)
+        x1 = max(0, x1)
+        y1 = max(0, y1)
+        x2 = min(self.width, x2)
+        y2 = min(self.height, y2)
+        
+        if x2 - x1 < 10 or y2 - y1 < 10:
+            return None
+
+        cache_key = (self.sheet_key, self.skew_angle, (x1, y1, x2, y2))
+        cached, found = self.shared.get_ocr(cache_key)
+        if found:
+            return cached
+        text = self._read_text(x1, y1, x2, y2)
+        self.shared.put_ocr(cache_key, text)
+        return text
+
+    def _read_text(self, x1, y1, x2, y2):
+        """Run OCR on a clamped box of the sheet."""
+        from PIL import Image, ImageEnhance
+
+        pytesseract = get_ocr()
+        text_region, scale = self.crop((x1, y1, x2, y2))
+        
+        # Enhance for OCR
+        text_region = text_region.convert('L')
+        enhancer = ImageEnhance.Contrast(text_region)
+        text_region = enhancer.enhance(2.0)
+        enhancer = ImageEnhance.Sharpness(text_region)
+        text_region = enhancer.enhance(2.0)
+        # Labels are read at 3x the working resolution; high-DPI renders need less upscaling
+        upscale = max(1.0, 3 / scale)
+        if upscale > 1:
+            text_region = text_region.resize((int(text_region.width * upscale), int(text_region.height * upscale)),
+                                             Image.Resampling.LANCZOS)
+        
+        try:
+            configs = ['--psm 7 --oem 3', '--psm 8 --oem 3', '--psm 13 --oem 3']
+            for config in configs:
+                text = clean_swatch_name(pytesseract.image_to_string(text_region, config=config))
+                if text and len(text) > 2:
+                    return text
+            return None
+        except Exception as e:
+            print(f"OCR error: {e}", file=sys.stderr)
+            return None
+
+
+class SwatchItem:
+    """A detected swatch on one sheet; saved once it has a name."""
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.overlay = None  # Canvas overlay id while shown
+        self.name = None
+        self.filepath = None  # Loose file, when not streaming to an archive
+        self.record = None
+
+
+def snapshot_file(path):
+    """Return a file's bytes (or None if absent) so a change to it can be undone."""
+    if path and os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    return None
+
+
+def restore_file(path, data):
+    """Put a file back to a snapshot taken with snapshot_file."""
+    if os.path.lexists(path):
+        os.remove(path)
+    if data is not None:
+        with open(path, "wb") as f:
+            f.write(data)
+
+
+class Command:
+    """A reversible edit recorded in the undo history."""
+
+    description = ""
+    undoable = True  # False for edits that cannot be taken back; they clear the history
+
+    def do(self):
+        raise NotImplementedError
+
+    def undo(self):
+        raise NotImplementedError
+
+
+class DetectCommand(Command):
+    """Show a newly detected swatch."""
+
+    def __init__(self, app, item):
+        self.app = app
+        self.item = item
+        self.description = "detect swatch"
+
+    def do(self):
+        self.app.show_item(self.item, "red")
+
+    def undo(self):
+        self.app.hide_item(self.item)
+
+
+class SaveCommand(Command):
+    """Save a detected swatch under a name; undo deletes (or restores) the file."""
+
+    def __init__(self, app, item, name):
+        self.app = app
+        self.item = item
+        self.name = name
+        self.description = f"save {name}"
+        self.undoable = app.output.removable
+        self.previous = None
+
+    def do(self):
+        self.previous = self.app.snapshot_target(self.name)
+        self.app.write_item(self.item, self.name)
+        self.app.show_item(self.item, "green")
+
+    def undo(self):
+        self.app.remove_item_file(self.item, restore=self.previous)
+        self.app.show_item(self.item, "red")
+
+
+class RenameCommand(Command):
+    """Rename a saved swatch's file."""
+
+    def __init__(self, app, item, new_name):
+        self.app = app
+        self.item = item
+        self.old_name = item.name
+        self.new_name = new_name
+        self.description = f"rename {item.name} to {new_name}"
+
+    def do(self):
+        self.app.rename_item(self.item, self.new_name)
+
+    def undo(self):
+        self.app.rename_item(self.item, self.old_name)
+
+
+class DeleteCommand(Command):
+    """Delete a saved swatch; undo writes its file back."""
+
+    def __init__(self, app, item):
+        self.app = app
+        self.item = item
+        self.name = item.name
+        self.description = f"delete {item.name}"
+        self.data = None
+
+    def do(self):
+        self.data = snapshot_file(self.item.filepath)
+        self.app.remove_item_file(self.item)
+        self.app.hide_item(self.item)
+
+    def undo(self):
+        self.app.show_item(self.item, "green")
+        self.app.restore_item_file(self.item, self.name, self.data)
+
+
+class BatchSaveCommand(Command):
+    """Save reviewed swatches in one step; files are written by a background thread."""
+
+    def __init__(self, app, entries):
+        self.app = app
+        self.entries = list(entries)
+        self.description = f"save {len(self.entries)} swatches"
+        self.undoable = app.output.removable
+        self.previous = {}  # item -> file contents it replaced, filled in by the writer
+
+    def do(self):
+        for item, name in self.entries:
+            self.app.review.remove(item)
+            self.app.show_item(item, "green")
+            self.app.queue_write(item, name, self.previous)
+
+    def undo(self):
+        self.app.flush_writes()
+        for item, name in reversed(self.entries):
+            if item.name is not None:
+                self.app.remove_item_file(item, restore=self.previous.pop(item, None))
+        # Undone swatches go back to the review queue, names and all, when
+        # reviewing; otherwise they are left as unsaved detections
+        for item, name in self.entries:
+            if self.app.review_mode:
+                self.app.show_item(item, "orange")
+                self.app.review.add(item, name)
+            else:
+                self.app.show_item(item, "red")
+
+
+class CommandHistory:
+    """Undo/redo stacks of Commands; each step touches only what it changed."""
+
+    def __init__(self, limit=1000):
+        self.undo_stack = deque(maxlen=limit)
+        self.redo_stack = []
+
+    def execute(self, command):
+        command.do()
+        if command.undoable:
+            self.undo_stack.append(command)
+        else:
+            self.undo_stack.clear()  # Earlier steps may depend on what it changed
+        self.redo_stack.clear()
+        return command
+
+    def undo(self):
+        if not self.undo_stack:
+            return None
+        command = self.undo_stack.pop()
+        command.undo()
+        self.redo_stack.append(command)
+        return command
+
+    def redo(self):
+        if not self.redo_stack:
+            return None
+        command = self.redo_stack.pop()
+        command.do()
+        self.undo_stack.append(command)
+        return command
+
+    def rollback(self):
+        """Undo the last command and forget it (e.g. a detection that was skipped)."""
+        command = self.undo()
+        if command is not None:
+            self.redo_stack.pop()
+        return command
+
+
+TEXT_INPUT_CLASSES = (tk.Entry, ttk.Entry, tk.Spinbox, tk.Text)
+
+
+def bind_shortcut(widget, sequence, action):
+    """Bind an application-wide key shortcut that stays out of text fields.
+
+    Root bindings also fire for keys typed into an Entry, so without this
+    typing "fuchsia" in a name field would refit the sheet and Ctrl+Z
+    would undo the last save.
+    """
+    def handler(event):
+        if not isinstance(event.widget, TEXT_INPUT_CLASSES):
+            action()
+    widget.bind(sequence, handler)
+
+
+class ReviewQueue:
+    """Non-modal list of detected swatches waiting for a name.
+
+    Each row has a thumbnail (rendered when first scrolled into view, then
+    cached) and an editable name. Up/Down move between rows, Enter accepts
+    one, Ctrl+Enter accepts all and Escape discards.
+    """
+
+    THUMB_SIZE = 48
+
+    def __init__(self, parent, app):
+        self.app = app
+        self.rows = []
+        self.thumbnails = {}  # bounds -> PhotoImage
+        self.placeholder = tk.PhotoImage(width=self.THUMB_SIZE, height=self.THUMB_SIZE)
+
+        self.frame = tk.Frame(parent, bg='#f0f0f0')
+        header = tk.Frame(self.frame, bg='#f0f0f0')
+        header.pack(fill=tk.X)
+        self.count_label = tk.Label(header, text="Pending: 0", font=("Arial", 10, "bold"), bg='#f0f0f0')
+        self.count_label.pack(side=tk.LEFT)
+        tk.Button(header, text="Discard", command=self.discard_focused,
+                  font=("Arial", 9), width=8).pack(side=tk.RIGHT)
+        tk.Button(header, text="Accept All", command=self.accept_all,
+                  font=("Arial", 9), width=10).pack(side=tk.RIGHT, padx=5)
+
+        body = tk.Frame(self.frame)
+        body.pack(fill=tk.BOTH, expand=True, pady=3)
+        self.canvas = tk.Canvas(body, height=220, bg='white', highlightthickness=0)
+        scrollbar = tk.Scrollbar(body, orient=tk.VERTICAL, command=self.yview)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.inner = tk.Frame(self.canvas, bg='white')
+        self.canvas.create_window(0, 0, window=self.inner, anchor=tk.NW)
+        self.inner.bind("<Configure>", self.on_configure)
+        self.canvas.bind("<Configure>", lambda e: self.load_visible_thumbnails())
+
+    def __len__(self):
+        return len(self.rows)
+
+    def yview(self, *args):
+        self.canvas.yview(*args)
+        self.load_visible_thumbnails()
+
+    def on_configure(self, event):
+        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+        self.load_visible_thumbnails()
+
+    def _row(self, item):
+        for row in self.rows:
+            if row["item"] is item:
+                return row
+        return None
+
+    def add(self, item, name=""):
+        frame = tk.Frame(self.inner, bg='white')
+        frame.pack(fill=tk.X, padx=2, pady=2)
+        thumb = tk.Label(frame, image=self.placeholder, bg='white')
+        thumb.pack(side=tk.LEFT)
+        var = tk.StringVar(value=name or "")
+        entry = tk.Entry(frame, textvariable=var, font=("Arial", 10), width=30)
+        entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+
+        entry.bind("<Up>", lambda e: self.move_focus(item, -1))
+        entry.bind("<Down>", lambda e: self.move_focus(item, 1))
+        entry.bind("<Return>", lambda e: self.accept(item))
+        entry.bind("<Control-Return>", lambda e: self.accept_all())
+        entry.bind("<Escape>", lambda e: self.discard(item))
+        entry.bind("<FocusIn>", lambda e: self.scroll_to(item))
+
+        self.rows.append({"item": item, "frame": frame, "thumb": thumb, "var": var,
+                          "entry": entry, "loaded": False})
+        self.update_count()
+        self.frame.after_idle(self.load_visible_thumbnails)
+        if len(self.rows) == 1:
+            entry.focus_set()
+
+    def remove(self, item):
+        row = self._row(item)
+        if row is None:
+            return
+        self.rows.remove(row)
+        row["frame"].destroy()
+        self.update_count()
+
+    def update_count(self):
+        self.count_label.config(text=f"Pending: {len(self.rows)}")
+
+    def thumbnail(self, item):
+        """Small preview of a swatch, rendered from the sheet once per box."""
+        photo = self.thumbnails.get(item.bounds)
+        if photo is None:
+            from PIL import ImageTk
+
+            crop, _ = self.app.detector.crop(item.bounds, high_res=False)
+            crop = crop.convert('RGB')
+            crop.thumbnail((self.THUMB_SIZE, self.THUMB_SIZE))
+            photo = self.thumbnails[item.bounds] = ImageTk.PhotoImage(crop)
+        return photo
+
+    def load_visible_thumbnails(self):
+        if not self.rows:
+            return
+        top = self.canvas.canvasy(0)
+        bottom = self.canvas.canvasy(self.canvas.winfo_height())
+        for row in self.rows:
+            if row["loaded"]:
+                continue
+            y = row["frame"].winfo_y()
+            if y + row["frame"].winfo_height() >= top and y <= bottom:
+                row["thumb"].config(image=self.thumbnail(row["item"]))
+                row["loaded"] = True
+
+    def scroll_to(self, item):
+        row = self._row(item)
+        total = self.inner.winfo_height()
+        if row is None or total <= 1:
+            return
+        y, height = row["frame"].winfo_y(), row["frame"].winfo_height()
+        top = self.canvas.canvasy(0)
+        visible = self.canvas.winfo_height()
+        if y < top:
+            self.canvas.yview_moveto(y / total)
+        elif y + height > top + visible:
+            self.canvas.yview_moveto((y + height - visible) / total)
+        self.load_visible_thumbnails()
+
+    def focus_row(self, index):
+        if self.rows:
+            index = max(0, min(index, len(self.rows) - 1))
+            self.rows[index]["entry"].focus_set()
+
+    def move_focus(self, item, step):
+        row = self._row(item)
+        if row is not None:
+            self.focus_row(self.rows.index(row) + step)
+        return "break"
+
+    def focused_item(self):
+        focus = self.frame.focus_get()
+        for row in self.rows:
+            if row["entry"] is focus:
+                return row["item"]
+        return self.rows[0]["item"] if self.rows else None
+
+    def accept(self, item):
+        row = self._row(item)
+        if row is None:
+            return
+        name = row["var"].get().strip()
+        if not name:
+            self.app.status_label.config(text="Enter a name first", fg="orange")
+            return
+        index = self.rows.index(row)
+        self.app.save_batch([(item, name)])
+        self.focus_row(index)
+
+    def accept_all(self):
+        entries = [(row["item"], row["var"].get().strip()) for row in self.rows]
+        unnamed = sum(1 for _, name in entries if not name)
+        self.app.save_batch([(item, name) for item, name in entries if name])
+        if unnamed:
+            self.app.status_label.config(text=f"{unnamed} swatches still need a name", fg="orange")
+            self.focus_row(0)
+        return "break"
+
+    def discard(self, item):
+        row = self._row(item)
+        if row is None:
+            return
+        index = self.rows.index(row)
+        self.remove(item)
+        self.app.hide_item(item)
+        self.focus_row(index)
+
+    def discard_focused(self):
+        item = self.focused_item()
+        if item is not None:
+            self.discard(item)
+
+
+class SwatchExtractor:
+    def __init__(self, root, image_path, parent=None, image=None, pyramid=None, shared=None,
+                 skew_angle=0.0, deskew=True, output=None, output_dpi=DEFAULT_OUTPUT_DPI, detect_scale=1):
+        self.root = root
+        # When hosted in a workspace tab the UI lives in `parent`, not the root window
+        self.parent = parent if parent is not None else root
+        self.standalone = parent is None
+        if self.standalone:
+            self.root.title("Color Swatch Extractor")
+
+        # Load image (a workspace hands over an already decoded sheet).
+        # original_image is the deskewed working image used by detection,
+        # OCR and cropping alike.
+        self.source = as_sheet_source(image_path)
+        self.image_path = self.source.path
+        self.sheet_key = self.source.key
+        self.shared = shared if shared is not None else SHARED_CACHE
+        if image is None:
+            image, pyramid, skew_angle = load_sheet(self.source, deskew)
+        self.skew_angle = skew_angle
+        self.original_image = image
+        self.viewer = ImageViewer(self.parent, self.original_image, pyramid)
+        self.detector = SwatchDetector(image, self.sheet_key, skew_angle, self.shared,
+                                       source=self.source, output_dpi=output_dpi,
+                                       detect_scale=detect_scale)
+        self.detector.auto_threshold = True
+
+        # State
+        self.selection_enabled = False
+        self.texture_mode = False  # For textured swatches
+        self.text_offset_from_color_x1 = None
+        self.text_offset_from_color_y1 = None
+        self.text_width = None
+        self.text_height = None
         self.learning_text_position = False
         self.drawing_text_box = False
         self.text_box_start = None
@@ -138,9 +1977,29 @@ class SwatchExtractor:
         self.last_swatch_bounds = None
         self.last_color_x = None
         self.last_color_y = None
-        self.rectangles = []
+        self.last_item = None
+        self.history = CommandHistory()
+        self.review_mode = False  # Queue detections for naming instead of prompting
+        self.writer = None
+        self.pending_writes = deque()
+        self.saved_items = []
+        # Canvas items: the sheet image, swatch overlays and the drag rectangle
+        self.image_item = None
+        self.overlays = {}  # overlay id -> (image-space bounds, canvas item)
+        self._next_overlay_id = 0
+        self.rubber_band = None
         self.extracted_count = 0
-        
+        self.duplicate_count = 0
+        self.dedup_mode = "report"  # "off", "report" or "link"
+        # Optional archive sink / JSON Lines manifest shared with other tabs
+        self.output = output if output is not None else StreamOutput()
+
+        # Reuse a name position learned on another sheet of this session
+        template = self.shared.get_text_template()
+        if template is not None:
+            (self.text_offset_from_color_x1, self.text_offset_from_color_y1,
+             self.text_width, self.text_height) = template
+
         # Pan state
         self.panning = False
         self.pan_start = None
@@ -155,13 +2014,17 @@ class SwatchExtractor:
         
         # Initial display
         self.update_canvas()
+        self.parent.after(2000, self.poll_memory)
+        if self.skew_angle:
+            self.status_label.config(text=f"Sheet deskewed by {self.skew_angle:+.2f}°", fg="blue")
     
     def create_ui(self):
-        # Make window fullscreen or large and centered
-        self.root.state('zoomed')  # Maximize window on Windows
-        
+        if self.standalone:
+            # Make window fullscreen or large and centered
+            self.root.state('zoomed')  # Maximize window on Windows
+
         # Use PanedWindow for resizable divider
-        paned_window = ttk.PanedWindow(self.root, orient=tk.HORIZONTAL)
+        paned_window = ttk.PanedWindow(self.parent, orient=tk.HORIZONTAL)
         paned_window.pack(fill=tk.BOTH, expand=True)
         
         # Canvas frame (left side)
@@ -239,6 +2102,50 @@ class SwatchExtractor:
                                        bg='#f0f0f0',
                                        activebackground='#f0f0f0')
         texture_check.pack(anchor=tk.W, pady=5)
+
+        # Sub-pixel edge refinement checkbox
+        self.refine_var = tk.BooleanVar(value=self.detector.refine_edges)
+        refine_check = tk.Checkbutton(inner_panel,
+                                      text="Refine Edges (sub-pixel)",
+                                      variable=self.refine_var,
+                                      command=lambda: setattr(self.detector, "refine_edges", self.refine_var.get()),
+                                      font=("Arial", 10),
+                                      bg='#f0f0f0',
+                                      activebackground='#f0f0f0')
+        refine_check.pack(anchor=tk.W, pady=5)
+
+        # Per-click color threshold from the local noise level
+        self.auto_threshold_var = tk.BooleanVar(value=self.detector.auto_threshold)
+        auto_threshold_check = tk.Checkbutton(inner_panel,
+                                              text="Auto Threshold (from local noise)",
+                                              variable=self.auto_threshold_var,
+                                              command=lambda: setattr(self.detector, "auto_threshold",
+                                                                      self.auto_threshold_var.get()),
+                                              font=("Arial", 10),
+                                              bg='#f0f0f0',
+                                              activebackground='#f0f0f0')
+        auto_threshold_check.pack(anchor=tk.W, pady=5)
+
+        # Duplicate handling for swatches that repeat across sheets
+        dedup_row = tk.Frame(inner_panel, bg='#f0f0f0')
+        dedup_row.pack(anchor=tk.W, pady=5)
+        tk.Label(dedup_row, text="Duplicates:", font=("Arial", 10), bg='#f0f0f0').pack(side=tk.LEFT)
+        self.dedup_var = tk.StringVar(value=self.dedup_mode)
+        dedup_menu = tk.OptionMenu(dedup_row, self.dedup_var, *DEDUP_MODES,
+                                   command=lambda value: setattr(self, "dedup_mode", value))
+        dedup_menu.config(font=("Arial", 9))
+        dedup_menu.pack(side=tk.LEFT, padx=5)
+
+        # Name swatches in a batch review list instead of one dialog each
+        self.review_var = tk.BooleanVar(value=False)
+        review_check = tk.Checkbutton(inner_panel,
+                                      text="Review Queue (name swatches later)",
+                                      variable=self.review_var,
+                                      command=self.toggle_review_mode,
+                                      font=("Arial", 10),
+                                      bg='#f0f0f0',
+                                      activebackground='#f0f0f0')
+        review_check.pack(anchor=tk.W, pady=5)
         
         tk.Label(inner_panel, text="", height=1, bg='#f0f0f0').pack()
         
@@ -266,8 +2173,37 @@ class SwatchExtractor:
                 font=("Arial", 10), bg='#f0f0f0').pack(anchor=tk.W, padx=5)
         tk.Label(inner_panel, text="• F: Fit to window", 
                 font=("Arial", 10), bg='#f0f0f0').pack(anchor=tk.W, padx=5)
-        self.root.bind("<f>", lambda e: self.fit_to_window())
-        self.root.bind("<F>", lambda e: self.fit_to_window())
+        tk.Label(inner_panel, text="• Ctrl+Z / Ctrl+Y: Undo / Redo",
+                font=("Arial", 10), bg='#f0f0f0').pack(anchor=tk.W, padx=5)
+        if self.standalone:
+            # A workspace routes these keys to whichever tab is active
+            bind_shortcut(self.root, "<f>", self.fit_to_window)
+            bind_shortcut(self.root, "<F>", self.fit_to_window)
+            bind_shortcut(self.root, "<Control-z>", self.undo)
+            bind_shortcut(self.root, "<Control-y>", self.redo)
+            bind_shortcut(self.root, "<Control-Z>", self.redo)
+
+        tk.Label(inner_panel, text="", height=1, bg='#f0f0f0').pack()
+
+        # Swatches saved from this sheet, with undoable edits
+        tk.Label(inner_panel, text="Saved swatches:",
+                font=("Arial", 11, "bold"), bg='#f0f0f0').pack(anchor=tk.W)
+        self.saved_listbox = tk.Listbox(inner_panel, height=6, font=("Arial", 10), exportselection=False)
+        self.saved_listbox.pack(fill=tk.X, pady=3)
+        self.saved_listbox.bind("<Delete>", lambda e: self.delete_selected())
+        self.saved_listbox.bind("<Double-Button-1>", lambda e: self.rename_selected())
+
+        edit_row = tk.Frame(inner_panel, bg='#f0f0f0')
+        edit_row.pack(fill=tk.X, pady=3)
+        for text, command in (("Undo", self.undo), ("Redo", self.redo),
+                              ("Rename", self.rename_selected), ("Delete", self.delete_selected)):
+            tk.Button(edit_row, text=text, command=command, font=("Arial", 9),
+                      width=8).pack(side=tk.LEFT, padx=(0, 5))
+
+        # Shown while review mode is on
+        review_slot = tk.Frame(inner_panel, bg='#f0f0f0')
+        review_slot.pack(fill=tk.X)
+        self.review = ReviewQueue(review_slot, self)
         
         tk.Label(inner_panel, text="", height=1, bg='#f0f0f0').pack()
         
@@ -280,6 +2216,14 @@ class SwatchExtractor:
                                    text=f"Zoom: {self.viewer.zoom_level:.0%}", 
                                    font=("Courier", 10), bg='#f0f0f0')
         self.zoom_label.pack(anchor=tk.W)
+
+        self.threshold_label = tk.Label(inner_panel, text="Threshold: -",
+                                        font=("Courier", 10), bg='#f0f0f0')
+        self.threshold_label.pack(anchor=tk.W)
+
+        self.memory_label = tk.Label(inner_panel, text=MEMORY.describe(),
+                                     font=("Courier", 10), bg='#f0f0f0')
+        self.memory_label.pack(anchor=tk.W)
         
         tk.Label(inner_panel, text="", height=1, bg='#f0f0f0').pack()
         
@@ -353,27 +2297,104 @@ class SwatchExtractor:
         self.zoom_label.config(text=f"Zoom: {self.viewer.zoom_level:.0%}")
     
     def update_canvas(self):
-        """Redraw the canvas with current image and overlays."""
-        # Get display image
-        display_img = self.viewer.get_display_image().copy()
-        draw = ImageDraw.Draw(display_img)
-        
-        # Draw rectangles on the image
-        for rect_data in self.rectangles:
-            x1, y1, x2, y2, color = rect_data
-            # Convert to display coordinates (relative to displayed image)
-            dx1 = int(x1 * self.viewer.zoom_level)
-            dy1 = int(y1 * self.viewer.zoom_level)
-            dx2 = int(x2 * self.viewer.zoom_level)
-            dy2 = int(y2 * self.viewer.zoom_level)
-            draw.rectangle([dx1, dy1, dx2, dy2], outline=color, width=max(2, int(2 * self.viewer.zoom_level)))
-        
+        """Re-render the sheet at the current zoom and reposition overlays.
+
+        Overlays are separate canvas items, so this is only needed when the
+        zoom changes; adding or removing a swatch touches one item.
+        """
+        from PIL import ImageTk
+
+        display_img, x, y = self.viewer.get_display_image(*self._view_size())
         self.viewer.photo = ImageTk.PhotoImage(display_img)
-        
-        # Clear and redraw
-        self.canvas.delete("all")
-        self.canvas.create_image(self.viewer.offset_x, self.viewer.offset_y, 
-                                anchor=tk.NW, image=self.viewer.photo)
+
+        if self.image_item is None:
+            self.image_item = self.canvas.create_image(x, y, anchor=tk.NW, image=self.viewer.photo)
+        else:
+            self.canvas.itemconfig(self.image_item, image=self.viewer.photo)
+            self.canvas.coords(self.image_item, x, y)
+
+        for overlay_id in self.overlays:
+            self._place_overlay(overlay_id)
+        self.canvas.tag_raise("overlay")
+
+        MEMORY.track((id(self.viewer), "photo"), display_img.width * display_img.height * 4,
+                     evict=self.drop_display)
+        self.refresh_memory()
+
+    def _view_size(self):
+        return (max(self.viewer.canvas_width, self.canvas.winfo_width()),
+                max(self.viewer.canvas_height, self.canvas.winfo_height()))
+
+    def drop_display(self):
+        """Free the rendered sheet of a tab that is not on screen."""
+        if self.canvas.winfo_viewable():
+            return False
+        if self.image_item is not None:
+            self.canvas.itemconfig(self.image_item, image="")
+        self.viewer.photo = None
+        self.viewer.rendered = None
+        return True
+
+    def restore_display(self):
+        """Re-render the sheet if its display buffer was evicted."""
+        if self.viewer.photo is None:
+            self.update_canvas()
+
+    def refresh_memory(self):
+        MEMORY.enforce()
+        self.memory_label.config(text=MEMORY.describe())
+
+    def poll_memory(self):
+        if self.parent.winfo_exists():
+            self.refresh_memory()
+            self.parent.after(2000, self.poll_memory)
+
+    def add_overlay(self, bounds, color):
+        """Draw a rectangle over image-space bounds; returns its overlay id."""
+        self._next_overlay_id += 1
+        overlay_id = self._next_overlay_id
+        item = self.canvas.create_rectangle(0, 0, 0, 0, outline=color, tags=("overlay",))
+        self.overlays[overlay_id] = (tuple(bounds), item)
+        self._place_overlay(overlay_id)
+        return overlay_id
+
+    def set_overlay_color(self, overlay_id, color):
+        self.canvas.itemconfig(self.overlays[overlay_id][1], outline=color)
+
+    def remove_overlay(self, overlay_id):
+        _, item = self.overlays.pop(overlay_id)
+        self.canvas.delete(item)
+
+    def _place_overlay(self, overlay_id):
+        (x1, y1, x2, y2), item = self.overlays[overlay_id]
+        sx1, sy1 = self.viewer.image_to_screen(x1, y1)
+        sx2, sy2 = self.viewer.image_to_screen(x2, y2)
+        self.canvas.coords(item, sx1, sy1, sx2, sy2)
+        self.canvas.itemconfig(item, width=max(2, int(2 * self.viewer.zoom_level)))
+
+    def show_item(self, item, color):
+        if item.overlay is None:
+            item.overlay = self.add_overlay(item.bounds, color)
+        else:
+            self.set_overlay_color(item.overlay, color)
+
+    def hide_item(self, item):
+        if item.overlay is not None:
+            self.remove_overlay(item.overlay)
+            item.overlay = None
+
+    def _draw_rubber_band(self, start, end, color):
+        """Show the box being dragged out, reusing one canvas item."""
+        if self.rubber_band is None:
+            self.rubber_band = self.canvas.create_rectangle(*start, *end, outline=color, width=2, dash=(5, 5))
+        else:
+            self.canvas.coords(self.rubber_band, *start, *end)
+            self.canvas.itemconfig(self.rubber_band, outline=color)
+
+    def _clear_rubber_band(self):
+        if self.rubber_band is not None:
+            self.canvas.delete(self.rubber_band)
+            self.rubber_band = None
     
     def on_mousewheel(self, event):
         if event.delta > 0:
@@ -394,7 +2415,12 @@ class SwatchExtractor:
             dy = event.y - self.pan_start[1]
             self.viewer.pan(dx, dy)
             self.pan_start = (event.x, event.y)
-            self.update_canvas()
+            # Panning moves the existing items, re-rendering only once the
+            # margin around the viewport has been used up
+            self.canvas.move(self.image_item, dx, dy)
+            self.canvas.move("overlay", dx, dy)
+            if not self.viewer.covers_view(*self._view_size()):
+                self.update_canvas()
     
     def end_pan(self, event):
         self.panning = False
@@ -426,25 +2452,45 @@ class SwatchExtractor:
         img_x, img_y = self.viewer.screen_to_image(event.x, event.y)
         
         # Detect color boundaries
-        x1, y1, x2, y2 = self.find_color_boundaries(img_x, img_y)
+        bounds = self.detector.find_color_boundaries(img_x, img_y)
+        if bounds is None:
+            self.status_label.config(text="Click inside the sheet", fg="red")
+            return
+        x1, y1, x2, y2 = bounds
+        mode = "auto" if self.detector.auto_threshold else "fixed"
+        self.threshold_label.config(text=f"Threshold: {self.detector.last_threshold} ({mode})")
         
         if x2 - x1 < 20 or y2 - y1 < 20:
-            self.status_label.config(text="Region too small, click on color center", fg="red")
+            self.status_label.config(text=f"Region too small at threshold {self.detector.last_threshold}, "
+                                          "click on color center", fg="red")
             return
         
-        # Store and draw
-        self.last_swatch_bounds = (x1, y1, x2, y2)
         self.last_color_x = img_x
         self.last_color_y = img_y
+        self.handle_detection((x1, y1, x2, y2))
+
+    def handle_detection(self, bounds):
+        """Show a detected swatch and ask for its name (learning the name box first).
+
+        In review mode the swatch is queued with its OCR'd name instead of
+        prompting, and only enters the undo history once accepted.
+        """
+        x1, y1, x2, y2 = bounds
+
+        # Store and draw
+        item = SwatchItem(bounds)
+        if self.review_mode:
+            self.show_item(item, "orange")
+        else:
+            self.history.execute(DetectCommand(self, item))
+        self.last_item = item
+        self.last_swatch_bounds = item.bounds
         
         if self.first_color_bounds is None:
-            self.first_color_bounds = (x1, y1, x2, y2)
-        
-        self.rectangles.append((x1, y1, x2, y2, "red"))
-        self.update_canvas()
+            self.first_color_bounds = item.bounds
         
         # Handle naming
-        if HAS_OCR and self.text_offset_from_color_x1 is None:
+        if has_ocr() and self.text_offset_from_color_x1 is None:
             self.learning_text_position = True
             self.mode_label.config(text="Mode: Draw box around name", fg="orange")
             self.status_label.config(text="Now drag box around the color's name", fg="blue")
@@ -453,7 +2499,7 @@ class SwatchExtractor:
                               "The box should tightly contain just the text label.",
                               parent=self.root)
             return
-        elif HAS_OCR and self.text_offset_from_color_x1 is not None:
+        elif has_ocr() and self.text_offset_from_color_x1 is not None:
             # Auto-detect name
             text_x1 = x1 + self.text_offset_from_color_x1
             text_y1 = y1 + self.text_offset_from_color_y1
@@ -461,44 +2507,35 @@ class SwatchExtractor:
             text_y2 = text_y1 + self.text_height
             
             # Show preview
-            self.rectangles.append((text_x1, text_y1, text_x2, text_y2, "cyan"))
-            self.update_canvas()
+            preview = self.add_overlay((text_x1, text_y1, text_x2, text_y2), "cyan")
+            self.canvas.update_idletasks()
             
-            name = self.extract_text_from_box(text_x1, text_y1, text_x2, text_y2)
+            name = self.detector.extract_text_from_box(text_x1, text_y1, text_x2, text_y2)
             
             # Remove preview
-            self.rectangles.pop()
-            
+            self.remove_overlay(preview)
+
+            if self.review_mode:
+                self.queue_for_review(item, name)
+                return
             if name:
                 confirmed_name = simpledialog.askstring("Swatch Name", 
                                                        f"Detected: {name}\n\nEdit or press OK to accept:", 
                                                        initialvalue=name)
-                if confirmed_name:
-                    self.save_swatch(x1, y1, x2, y2, confirmed_name)
-                    self.rectangles[-1] = (x1, y1, x2, y2, "green")
-                    self.update_canvas()
-                else:
-                    self.rectangles.pop()
-                    self.update_canvas()
             else:
                 self.status_label.config(text="Couldn't read text, enter manually", fg="orange")
-                name = simpledialog.askstring("Swatch Name", "Couldn't detect text.\n\nEnter color name (or cancel to skip):")
-                if name:
-                    self.save_swatch(x1, y1, x2, y2, name)
-                    self.rectangles[-1] = (x1, y1, x2, y2, "green")
-                    self.update_canvas()
-                else:
-                    self.rectangles.pop()
-                    self.update_canvas()
+                confirmed_name = simpledialog.askstring("Swatch Name", "Couldn't detect text.\n\nEnter color name (or cancel to skip):")
+        elif self.review_mode:
+            self.queue_for_review(item)
+            return
         else:
-            name = simpledialog.askstring("Swatch Name", "Enter color name (or cancel to skip):")
-            if name:
-                self.save_swatch(x1, y1, x2, y2, name)
-                self.rectangles[-1] = (x1, y1, x2, y2, "green")
-                self.update_canvas()
-            else:
-                self.rectangles.pop()
-                self.update_canvas()
+            confirmed_name = simpledialog.askstring("Swatch Name", "Enter color name (or cancel to skip):")
+
+        if confirmed_name:
+            self.save_item(item, confirmed_name)
+        else:
+            # Skipped swatches leave nothing behind, not even an undo step
+            self.history.rollback()
     
     def on_drag(self, event):
         if not self.selection_enabled:
@@ -506,20 +2543,16 @@ class SwatchExtractor:
         
         # Handle text box drawing
         if self.drawing_text_box and self.text_box_start:
-            self.update_canvas()
-            start_x, start_y = self.text_box_start
-            self.canvas.create_rectangle(start_x, start_y, event.x, event.y, 
-                                         outline="blue", width=2, dash=(5, 5))
+            self._draw_rubber_band(self.text_box_start, (event.x, event.y), "blue")
             return
         
         # Handle manual swatch selection (textured mode)
         if self.manual_swatch_selection and self.manual_swatch_start:
-            self.update_canvas()
-            start_x, start_y = self.manual_swatch_start
-            self.canvas.create_rectangle(start_x, start_y, event.x, event.y, 
-                                         outline="red", width=2, dash=(5, 5))
+            self._draw_rubber_band(self.manual_swatch_start, (event.x, event.y), "red")
     
     def on_release(self, event):
+        self._clear_rubber_band()
+
         # Handle text box completion
         if self.drawing_text_box and self.text_box_start:
             start_x, start_y = self.text_box_start
@@ -538,23 +2571,25 @@ class SwatchExtractor:
             self.text_offset_from_color_y1 = y1 - color_y1
             self.text_width = x2 - x1
             self.text_height = y2 - y1
-            
+            self.shared.set_text_template(self.text_offset_from_color_x1, self.text_offset_from_color_y1,
+                                          self.text_width, self.text_height)
+
             self.drawing_text_box = False
             self.text_box_start = None
             self.learning_text_position = False
             
             self.mode_label.config(text="Mode: Auto-detect names", fg="green")
             
-            text = self.extract_text_from_box(x1, y1, x2, y2)
-            
-            if text:
+            text = self.detector.extract_text_from_box(x1, y1, x2, y2)
+
+            if self.review_mode and self.last_item is not None:
+                self.queue_for_review(self.last_item, text)
+            elif text:
                 name = simpledialog.askstring("Swatch Name", 
                                              f"Detected: {text}\n\nEdit or press OK to accept:", 
                                              initialvalue=text)
-                if name:
-                    sx1, sy1, sx2, sy2 = self.last_swatch_bounds
-                    self.save_swatch(sx1, sy1, sx2, sy2, name)
-                    self.rectangles[-1] = (sx1, sy1, sx2, sy2, "green")
+                if name and self.last_item is not None:
+                    self.save_item(self.last_item, name)
                     self.status_label.config(text=f"Learned! Click other swatches", fg="green")
         
         # Handle manual swatch selection completion (textured mode)
@@ -577,339 +2612,1573 @@ class SwatchExtractor:
             initial_y1, initial_y2 = min(img_y1, img_y2), max(img_y1, img_y2)
             
             # Use drawn region as search area and detect actual boundaries within it
-            x1, y1, x2, y2 = self.find_swatch_in_region(initial_x1, initial_y1, initial_x2, initial_y2)
+            x1, y1, x2, y2 = self.detector.find_swatch_in_region(initial_x1, initial_y1, initial_x2, initial_y2)
             
+            self.manual_swatch_selection = False
+            self.manual_swatch_start = None
+
             if x2 - x1 < 20 or y2 - y1 < 20:
                 self.status_label.config(text="Region too small, try again", fg="red")
-                self.manual_swatch_selection = False
-                self.manual_swatch_start = None
                 return
             
-            # Store and draw
-            self.last_swatch_bounds = (x1, y1, x2, y2)
-            
-            if self.first_color_bounds is None:
-                self.first_color_bounds = (x1, y1, x2, y2)
-            
-            self.rectangles.append((x1, y1, x2, y2, "red"))
-            self.update_canvas()
-            
-            self.manual_swatch_selection = False
-            self.manual_swatch_start = None
-            
-            # Handle naming
-            if HAS_OCR and self.text_offset_from_color_x1 is None:
-                self.learning_text_position = True
-                self.mode_label.config(text="Mode: Draw box around name", fg="orange")
-                self.status_label.config(text="Now drag box around the color's name", fg="blue")
-                messagebox.showinfo("Next Step", 
-                                  "Good! Now click and drag to draw a box\naround the NAME of this selected color.\n\n"
-                                  "The box should tightly contain just the text label.",
-                                  parent=self.root)
-                return
-            elif HAS_OCR and self.text_offset_from_color_x1 is not None:
-                # Auto-detect name
-                text_x1 = x1 + self.text_offset_from_color_x1
-                text_y1 = y1 + self.text_offset_from_color_y1
-                text_x2 = text_x1 + self.text_width
-                text_y2 = text_y1 + self.text_height
-                
-                # Show preview
-                self.rectangles.append((text_x1, text_y1, text_x2, text_y2, "cyan"))
-                self.update_canvas()
-                
-                name = self.extract_text_from_box(text_x1, text_y1, text_x2, text_y2)
-                
-                # Remove preview
-                self.rectangles.pop()
-                
-                if name:
-                    confirmed_name = simpledialog.askstring("Swatch Name", 
-                                                           f"Detected: {name}\n\nEdit or press OK to accept:", 
-                                                           initialvalue=name)
-                    if confirmed_name:
-                        self.save_swatch(x1, y1, x2, y2, confirmed_name)
-                        self.rectangles[-1] = (x1, y1, x2, y2, "green")
-                        self.update_canvas()
-                    else:
-                        self.rectangles.pop()
-                        self.update_canvas()
-                else:
-                    self.status_label.config(text="Couldn't read text, enter manually", fg="orange")
-                    name = simpledialog.askstring("Swatch Name", "Couldn't detect text.\n\nEnter color name (or cancel to skip):")
-                    if name:
-                        self.save_swatch(x1, y1, x2, y2, name)
-                        self.rectangles[-1] = (x1, y1, x2, y2, "green")
-                        self.update_canvas()
-                    else:
-                        self.rectangles.pop()
-                        self.update_canvas()
+            self.handle_detection((x1, y1, x2, y2))
+
+    def save_item(self, item, name):
+        """Save a detected swatch as an undoable step."""
+        self.history.execute(SaveCommand(self, item, name))
+
+    # Review queue and background writer
+
+    def toggle_review_mode(self):
+        self.review_mode = self.review_var.get()
+        if self.review_mode:
+            self.review.frame.pack(fill=tk.BOTH, expand=True)
+            self.status_label.config(text="Review mode: detections are queued for naming", fg="blue")
+        else:
+            self.review.frame.pack_forget()
+            if len(self.review):
+                self.status_label.config(text=f"{len(self.review)} swatches still pending review", fg="orange")
+
+    def queue_for_review(self, item, name=""):
+        self.review.add(item, name)
+        self.status_label.config(text=f"Queued for review ({len(self.review)} pending)", fg="blue")
+
+    def save_batch(self, entries):
+        """Save accepted review rows as one undoable step."""
+        if entries:
+            self.history.execute(BatchSaveCommand(self, entries))
+
+    def queue_write(self, item, name, previous):
+        """Write a swatch on the background writer thread."""
+        if self.writer is None:
+            self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="swatch-writer")
+
+        output_dir = self.get_output_dir()  # Read the entry on the UI thread
+
+        def job():
+            previous[item] = self.snapshot_target(name, output_dir)
+            return self.store_item(item, name, output_dir)
+
+        self.pending_writes.append((self.writer.submit(job), item, name))
+        if len(self.pending_writes) == 1:
+            self.root.after(50, self.poll_writes)
+
+    def _finish_pending(self, update_ui=True):
+        future, item, name = self.pending_writes.popleft()
+        try:
+            message = future.result()
+        except Exception as e:
+            item.name = None
+            if update_ui:
+                self.show_item(item, "red")
+                self.status_label.config(text=f"Failed to save {name}.png: {e}", fg="red")
             else:
-                name = simpledialog.askstring("Swatch Name", "Enter color name (or cancel to skip):")
-                if name:
-                    self.save_swatch(x1, y1, x2, y2, name)
-                    self.rectangles[-1] = (x1, y1, x2, y2, "green")
-                    self.update_canvas()
-                else:
-                    self.rectangles.pop()
-                    self.update_canvas()
+                print(f"Failed to save {name}.png: {e}", file=sys.stderr)
             return
-    
-    def find_color_boundaries(self, click_x, click_y, threshold=30):
-        pixels = self.original_image.load()
-        center_color = pixels[click_x, click_y]
-        
-        def color_matches(x, y):
-            if x < 0 or y < 0 or x >= self.viewer.img_width or y >= self.viewer.img_height:
-                return False
-            pixel = pixels[x, y]
-            diff = sum(abs(pixel[i] - center_color[i]) for i in range(3))
-            return diff < threshold
-        
-        x1 = click_x
-        while x1 > 0 and color_matches(x1 - 1, click_y):
-            x1 -= 1
-        
-        x2 = click_x
-        while x2 < self.viewer.img_width - 1 and color_matches(x2 + 1, click_y):
-            x2 += 1
-        
-        y1 = click_y
-        while y1 > 0 and color_matches(click_x, y1 - 1):
-            y1 -= 1
-        
-        y2 = click_y
-        while y2 < self.viewer.img_height - 1 and color_matches(click_x, y2 + 1):
-            y2 += 1
-        
-        margin = 2
-        x1 = min(x1 + margin, click_x)
-        y1 = min(y1 + margin, click_y)
-        x2 = max(x2 - margin, click_x)
-        y2 = max(y2 - margin, click_y)
-        
-        return x1, y1, x2, y2
-    
-    def find_textured_swatch_boundaries(self, click_x, click_y):
-        """Find boundaries of textured swatches using enhanced edge detection."""
-        pixels = self.original_image.load()
-        width, height = self.viewer.img_width, self.viewer.img_height
-        
-        # Get a larger sample of colors around click point to understand the texture
-        sample_radius = 15
-        color_samples = []
-        for dy in range(-sample_radius, sample_radius + 1, 2):
-            for dx in range(-sample_radius, sample_radius + 1, 2):
-                sx = click_x + dx
-                sy = click_y + dy
-                if 0 <= sx < width and 0 <= sy < height:
-                    color_samples.append(pixels[sx, sy])
-        
-        if not color_samples:
-            return self.find_color_boundaries(click_x, click_y)
-        
-        # Calculate average color for the texture
-        avg_r = sum(c[0] for c in color_samples) / len(color_samples)
-        avg_g = sum(c[1] for c in color_samples) / len(color_samples)
-        avg_b = sum(c[2] for c in color_samples) / len(color_samples)
-        
-        # Calculate standard deviation
-        variance = sum(
-            (c[0] - avg_r)**2 + (c[1] - avg_g)**2 + (c[2] - avg_b)**2 
-            for c in color_samples
-        ) / len(color_samples)
-        std_dev = variance ** 0.5
-        
-        # More generous threshold for textured swatches
-        texture_threshold = max(70, min(140, std_dev * 3.5))
-        
-        def texture_matches(x, y):
-            """Check if pixel is part of the textured swatch."""
-            if x < 0 or y < 0 or x >= width or y >= height:
-                return False
-            pixel = pixels[x, y]
-            # Use Euclidean distance in color space
-            diff = ((pixel[0] - avg_r)**2 + (pixel[1] - avg_g)**2 + (pixel[2] - avg_b)**2) ** 0.5
-            return diff < texture_threshold
-        
-        # Use flood fill with limits to prevent freezing
-        visited = set()
-        queue = [(click_x, click_y)]
-        min_x, max_x = click_x, click_x
-        min_y, max_y = click_y, click_y
-        pixel_count = 0
-        max_pixels = 100000  # Safety limit to prevent freezing
-        
-        while queue and pixel_count < max_pixels:
-            x, y = queue.pop(0)
-            if (x, y) in visited:
-                continue
-            if not texture_matches(x, y):
-                continue
-                
-            visited.add((x, y))
-            pixel_count += 1
-            
-            # Update bounding box on the fly
-            min_x = min(min_x, x)
-            max_x = max(max_x, x)
-            min_y = min(min_y, y)
-            max_y = max(max_y, y)
-            
-            # Check 4-connected neighbors
-            for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-                nx, ny = x + dx, y + dy
-                if (nx, ny) not in visited and 0 <= nx < width and 0 <= ny < height:
-                    queue.append((nx, ny))
-        
-        if pixel_count == 0:
-            return self.find_color_boundaries(click_x, click_y)
-        
-        x1, x2 = min_x, max_x
-        y1, y2 = min_y, max_y
-        
-        # Small margin adjustment
-        margin = 2
-        x1 = max(0, x1 - margin)
-        y1 = max(0, y1 - margin)
-        x2 = min(width - 1, x2 + margin)
-        y2 = min(height - 1, y2 + margin)
-        
-        return x1, y1, x2, y2
-    
-    def find_swatch_in_region(self, region_x1, region_y1, region_x2, region_y2):
-        """Find actual swatch boundaries within the user-drawn region using edge detection."""
-        pixels = self.original_image.load()
-        width, height = self.viewer.img_width, self.viewer.img_height
-        
-        # Ensure coordinates are within bounds and integers
-        region_x1 = max(0, min(int(region_x1), width - 1))
-        region_x2 = max(0, min(int(region_x2), width - 1))
-        region_y1 = max(0, min(int(region_y1), height - 1))
-        region_y2 = max(0, min(int(region_y2), height - 1))
-        
-        # Find the strongest vertical edges (likely swatch borders)
-        # Scan from left - look for strongest vertical edge
-        best_left = region_x1
-        max_edge_strength = 0
-        search_range = min(50, (region_x2 - region_x1) // 2)
-        for x in range(region_x1, min(region_x1 + search_range, region_x2)):
-            edge_strength = 0
-            for y in range(region_y1, region_y2):
-                if x > 0 and x < width - 1:
-                    left_color = pixels[x - 1, y]
-                    right_color = pixels[x + 1, y]
-                    diff = sum(abs(left_color[i] - right_color[i]) for i in range(3))
-                    edge_strength += diff
-            if edge_strength > max_edge_strength:
-                max_edge_strength = edge_strength
-                best_left = x
-        
-        # Scan from right - look for strongest vertical edge
-        best_right = region_x2
-        max_edge_strength = 0
-        search_range = min(50, (region_x2 - region_x1) // 2)
-        for x in range(region_x2, max(region_x2 - search_range, region_x1), -1):
-            edge_strength = 0
-            for y in range(region_y1, region_y2):
-                if x > 0 and x < width - 1:
-                    left_color = pixels[x - 1, y]
-                    right_color = pixels[x + 1, y]
-                    diff = sum(abs(left_color[i] - right_color[i]) for i in range(3))
-                    edge_strength += diff
-            if edge_strength > max_edge_strength:
-                max_edge_strength = edge_strength
-                best_right = x
-        
-        # Find the strongest horizontal edges
-        # Scan from top - look for strongest horizontal edge
-        best_top = region_y1
-        max_edge_strength = 0
-        search_range = min(50, (region_y2 - region_y1) // 2)
-        for y in range(region_y1, min(region_y1 + search_range, region_y2)):
-            edge_strength = 0
-            for x in range(region_x1, region_x2):
-                if y > 0 and y < height - 1:
-                    top_color = pixels[x, y - 1]
-                    bottom_color = pixels[x, y + 1]
-                    diff = sum(abs(top_color[i] - bottom_color[i]) for i in range(3))
-                    edge_strength += diff
-            if edge_strength > max_edge_strength:
-                max_edge_strength = edge_strength
-                best_top = y
-        
-        # Scan from bottom - look for strongest horizontal edge
-        best_bottom = region_y2
-        max_edge_strength = 0
-        search_range = min(50, (region_y2 - region_y1) // 2)
-        for y in range(region_y2, max(region_y2 - search_range, region_y1), -1):
-            edge_strength = 0
-            for x in range(region_x1, region_x2):
-                if y > 0 and y < height - 1:
-                    top_color = pixels[x, y - 1]
-                    bottom_color = pixels[x, y + 1]
-                    diff = sum(abs(top_color[i] - bottom_color[i]) for i in range(3))
-                    edge_strength += diff
-            if edge_strength > max_edge_strength:
-                max_edge_strength = edge_strength
-                best_bottom = y
-        
-        return best_left, best_top, best_right, best_bottom
-    
-    def extract_text_from_box(self, x1, y1, x2, y2):
-        if not HAS_OCR:
+        if update_ui:
+            self._finish_write(item, message)
+        else:
+            self.extracted_count += 1
+
+    def poll_writes(self):
+        while self.pending_writes and self.pending_writes[0][0].done():
+            self._finish_pending()
+        if self.pending_writes:
+            self.root.after(50, self.poll_writes)
+        else:
+            flush_swatch_indexes()  # Once per batch rather than once per swatch
+
+    def flush_writes(self, update_ui=True):
+        """Wait for queued writes to land (before undoing them, or on exit)."""
+        while self.pending_writes:
+            self._finish_pending(update_ui)
+        flush_swatch_indexes()
+
+    def shutdown(self):
+        self.flush_writes(update_ui=False)
+        if self.writer is not None:
+            self.writer.shutdown(wait=True)
+        self.viewer.release_memory()
+
+    def snapshot_target(self, name, output_dir=None):
+        """Contents of the file a save under this name would replace, if any."""
+        sink = self.output.sink
+        if isinstance(sink, DirectorySink):
+            # Names already used this session get a suffix instead of replacing
+            filename = f"{name}.png"
+            if filename in self.output.used_filenames:
+                return None
+            return snapshot_file(os.path.join(sink.directory, filename))
+        if sink is not None:
             return None
-        
-        x1, x2 = min(x1, x2), max(x1, x2)
-        y1, y2 = min(y1, y2), max(y1, y2)
-        x1 = max(0, x1)
-        y1 = max(0, y1)
-        x2 = min(self.viewer.img_width, x2)
-        y2 = min(self.viewer.img_height, y2)
-        
-        if x2 - x1 < 10 or y2 - y1 < 10:
+        return snapshot_file(os.path.join(output_dir or self.get_output_dir(), f"{name}.png"))
+
+    def write_item(self, item, name):
+        """Crop and store a swatch (loose file or archive sink) and publish its record."""
+        self._finish_write(item, self.store_item(item, name))
+
+    def store_item(self, item, name, output_dir=None):
+        """The file-writing half of write_item; safe to run off the UI thread
+        when given the output directory."""
+        x1, y1, x2, y2 = item.bounds
+        output_dir = output_dir or self.get_output_dir()
+
+        swatch, scale = self.detector.crop((x1, y1, x2, y2))
+        record = make_swatch_record(name, (x1, y1, x2, y2), swatch)
+        if scale != 1.0:
+            record["scale"] = scale
+        record["sheet"] = self.image_path
+        if self.source.page is not None:
+            record["page"] = self.source.page + 1
+
+        filepath, message = store_swatch(swatch, record, output_dir, self.output, self.dedup_mode)
+        if record.get("duplicate_of"):
+            self.duplicate_count += 1
+
+        item.name, item.filepath, item.record = name, filepath, record
+        return message
+
+    def _finish_write(self, item, message):
+        self._list_saved(item)
+        self.extracted_count += 1
+        self.status_label.config(text=message, fg="green")
+        self.extracted_label.config(text=f"Extracted: {self.extracted_count}")
+
+    @staticmethod
+    def _indexed(item):
+        """True if the swatch was saved with dedup on (store_swatch then sets
+        "duplicate_of"), so edits to its file must update the swatch index."""
+        return "duplicate_of" in item.record
+
+    def remove_item_file(self, item, restore=None):
+        """Delete a saved swatch's file (putting back `restore` bytes if it replaced one)."""
+        if item.filepath is not None:
+            restore_file(item.filepath, restore)
+            if self.output.sink is not None:
+                self.output.release(os.path.basename(item.filepath))
+            if self._indexed(item):
+                index = get_swatch_index(os.path.dirname(item.filepath))
+                index.remove(os.path.basename(item.filepath))
+                if restore is not None:
+                    index.add(os.path.basename(item.filepath), png_fingerprint(restore))
+        self.output.event("delete", item.record)
+        self._unlist_saved(item)
+        self.extracted_count -= 1
+        self.status_label.config(text=f"Removed: {item.name}.png", fg="orange")
+        self.extracted_label.config(text=f"Extracted: {self.extracted_count}")
+        item.name = None
+
+    def restore_item_file(self, item, name, data):
+        """Undo a delete: write the file back and republish the record."""
+        item.name = name
+        if item.filepath is not None and data is not None:
+            restore_file(item.filepath, data)
+            if self._indexed(item):
+                index = get_swatch_index(os.path.dirname(item.filepath))
+                index.add(os.path.basename(item.filepath), png_fingerprint(data),
+                          duplicate_of=item.record.get("duplicate_of"))
+        self.output.event("restore", item.record)
+        self._list_saved(item)
+        self.extracted_count += 1
+        self.status_label.config(text=f"Restored: {name}.png", fg="green")
+        self.extracted_label.config(text=f"Extracted: {self.extracted_count}")
+
+    def rename_item(self, item, new_name):
+        """Rename a saved swatch's file in place."""
+        old_name = item.name
+        if item.filepath is not None:
+            new_path = os.path.join(os.path.dirname(item.filepath), f"{new_name}.png")
+            if os.path.exists(new_path):
+                raise FileExistsError(f"{new_name}.png already exists")
+            os.rename(item.filepath, new_path)
+            if self._indexed(item):
+                index = get_swatch_index(os.path.dirname(item.filepath))
+                index.rename(os.path.basename(item.filepath), os.path.basename(new_path))
+            item.filepath = new_path
+            item.record["file"] = new_path
+        item.name = new_name
+        item.record["name"] = new_name
+        self.output.event("rename", item.record, previous_name=old_name)
+        self._update_saved_entry(item)
+        self.status_label.config(text=f"Renamed: {old_name} → {new_name}", fg="green")
+
+    # Saved-swatch list and undo/redo controls
+
+    def _list_saved(self, item):
+        self.saved_items.append(item)
+        self.saved_listbox.insert(tk.END, item.name)
+
+    def _unlist_saved(self, item):
+        if item in self.saved_items:
+            index = self.saved_items.index(item)
+            del self.saved_items[index]
+            self.saved_listbox.delete(index)
+
+    def _update_saved_entry(self, item):
+        if item in self.saved_items:
+            index = self.saved_items.index(item)
+            self.saved_listbox.delete(index)
+            self.saved_listbox.insert(index, item.name)
+
+    def _selected_saved_item(self):
+        selection = self.saved_listbox.curselection()
+        if not selection:
+            self.status_label.config(text="Select a saved swatch first", fg="orange")
+            return None
+        return self.saved_items[selection[0]]
+
+    def rename_selected(self):
+        item = self._selected_saved_item()
+        if item is None:
+            return
+        new_name = simpledialog.askstring("Rename Swatch", "New name:", initialvalue=item.name,
+                                          parent=self.root)
+        if new_name and new_name != item.name:
+            try:
+                self.history.execute(RenameCommand(self, item, new_name))
+            except OSError as e:
+                messagebox.showerror("Rename failed", str(e), parent=self.root)
+
+    def delete_selected(self):
+        item = self._selected_saved_item()
+        if item is not None:
+            self.history.execute(DeleteCommand(self, item))
+
+    def undo(self):
+        try:
+            command = self.history.undo()
+        except OSError as e:
+            messagebox.showerror("Undo failed", str(e), parent=self.root)
+            return
+        if command is None:
+            self.status_label.config(text="Nothing to undo", fg="orange")
+        else:
+            self.status_label.config(text=f"Undid: {command.description}", fg="blue")
+
+    def redo(self):
+        try:
+            command = self.history.redo()
+        except OSError as e:
+            messagebox.showerror("Redo failed", str(e), parent=self.root)
+            return
+        if command is None:
+            self.status_label.config(text="Nothing to redo", fg="orange")
+        else:
+            self.status_label.config(text=f"Redid: {command.description}", fg="blue")
+
+
+class Workspace:
+    """Tabbed workspace with one SwatchExtractor per sheet.
+
+    Sheets are the files of a folder, or the pages/frames of a PDF or
+    multi-page TIFF.
+    """
+
+    def __init__(self, root, sources, title, shared=None, deskew=True, output=None,
+                 output_dpi=DEFAULT_OUTPUT_DPI, detect_scale=1):
+        self.root = root
+        self.output = output
+        self.output_dpi = output_dpi
+        self.detect_scale = detect_scale
+        self.shared = shared if shared is not None else SHARED_CACHE
+        self.sources = [as_sheet_source(source) for source in sources]
+        if not self.sources:
+            raise ValueError(f"No sheets found in {title}")
+
+        self.root.title(f"Color Swatch Extractor - {title}")
+        self.root.state('zoomed')  # Maximize window on Windows
+
+        self.deskew = deskew
+        self.preloader = SheetPreloader(deskew=deskew)
+        self.tabs = {}
+        self.frames = []
+
+        self.notebook = ttk.Notebook(self.root)
+        self.notebook.pack(fill=tk.BOTH, expand=True)
+        self.notebook.enable_traversal()  # Ctrl+Tab / Ctrl+Shift+Tab switch sheets
+
+        # Tabs start empty; each sheet is only built when first selected
+        for source in self.sources:
+            frame = tk.Frame(self.notebook)
+            self.notebook.add(frame, text=source.label)
+            self.frames.append(frame)
+
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        bind_shortcut(self.root, "<f>", self.active_fit_to_window)
+        bind_shortcut(self.root, "<F>", self.active_fit_to_window)
+        bind_shortcut(self.root, "<Control-z>", self.active_undo)
+        bind_shortcut(self.root, "<Control-y>", self.active_redo)
+        bind_shortcut(self.root, "<Control-Z>", self.active_redo)
+
+        # Let the window paint before decoding the first sheet
+        self.preloader.preload(self.sources[0])
+        self.root.after_idle(self.on_tab_changed)
+
+    @property
+    def extracted_count(self):
+        return sum(tab.extracted_count for tab in self.tabs.values())
+
+    @property
+    def output_dirs(self):
+        return sorted({tab.output_dir for tab in self.tabs.values()})
+
+    def active_tab(self):
+        if not self.notebook.tabs():
             return None
-        
-        text_region = self.original_image.crop((x1, y1, x2, y2))
-        
-        # Enhance for OCR
-        text_region = text_region.convert('L')
-        enhancer = ImageEnhance.Contrast(text_region)
-        text_region = enhancer.enhance(2.0)
-        enhancer = ImageEnhance.Sharpness(text_region)
-        text_region = enhancer.enhance(2.0)
-        text_region = text_region.resize((text_region.width * 3, text_region.height * 3), Image.Resampling.LANCZOS)
-        
+        return self.tabs.get(self.notebook.index("current"))
+
+    def active_fit_to_window(self):
+        tab = self.active_tab()
+        if tab is not None:
+            tab.fit_to_window()
+
+    def active_undo(self):
+        tab = self.active_tab()
+        if tab is not None:
+            tab.undo()
+
+    def active_redo(self):
+        tab = self.active_tab()
+        if tab is not None:
+            tab.redo()
+
+    def on_tab_changed(self, event=None):
+        index = self.notebook.index("current")
+        if index not in self.tabs:
+            source = self.sources[index]
+            self.root.config(cursor="watch")
+            self.root.update_idletasks()
+            try:
+                image, pyramid, angle = self.preloader.get(source)
+                self.tabs[index] = SwatchExtractor(self.root, source, parent=self.frames[index],
+                                                   image=image, pyramid=pyramid, shared=self.shared,
+                                                   skew_angle=angle, deskew=self.deskew,
+                                                   output=self.output, output_dpi=self.output_dpi,
+                                                   detect_scale=self.detect_scale)
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to load image:\n{e}", parent=self.root)
+                print(f"Error loading {source.label}: {e}", file=sys.stderr)
+            finally:
+                self.root.config(cursor="")
+        elif self.tabs[index].viewer.photo is None:
+            self.tabs[index].restore_display()
+
+        # Warm up the next sheet while the operator works on this one
+        next_index = index + 1
+        if next_index < len(self.sources) and next_index not in self.tabs:
+            self.preloader.preload(self.sources[next_index])
+
+    def shutdown(self):
+        self.preloader.shutdown()
+        for tab in self.tabs.values():
+            tab.shutdown()
+
+
+def encode_png(image):
+    import io
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class DirectorySink:
+    """Write swatches as loose PNG files, as the GUI always has."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, filename, data):
+        path = os.path.join(self.directory, filename)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def close(self):
+        pass
+
+
+class TarSink:
+    """Stream swatches into a tar archive (a file, or stdout for "-")."""
+
+    def __init__(self, target):
+        import tarfile
+
+        self.target = target
+        self.lock = threading.Lock()
+        if target == "-":
+            self.tar = tarfile.open(fileobj=sys.stdout.buffer, mode="w|")
+        else:
+            self.tar = tarfile.open(target, mode="w|")
+
+    def write(self, filename, data):
+        import io
+        import tarfile
+        import time
+
+        info = tarfile.TarInfo(filename)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        with self.lock:
+            self.tar.addfile(info, io.BytesIO(data))
+        return filename
+
+    def close(self):
+        with self.lock:
+            self.tar.close()
+
+
+class ZipSink:
+    """Stream swatches into an uncompressed zip archive (PNGs are already compressed)."""
+
+    def __init__(self, target):
+        import zipfile
+
+        self.target = target
+        self.lock = threading.Lock()
+        stream = sys.stdout.buffer if target == "-" else target
+        self.zip = zipfile.ZipFile(stream, mode="w", compression=zipfile.ZIP_STORED)
+
+    def write(self, filename, data):
+        import time
+        import zipfile
+
+        with self.lock:
+            self.zip.writestr(zipfile.ZipInfo(filename, time.localtime()[:6]), data)
+        return filename
+
+    def close(self):
+        with self.lock:
+            self.zip.close()
+
+
+def open_sink(spec):
+    """Open a sink from "dir:PATH", "tar:PATH" or "zip:PATH" ("-" streams to stdout)."""
+    kind, _, target = spec.partition(":")
+    if not target:
+        raise ValueError(f"Sink needs a target, e.g. tar:swatches.tar (got {spec!r})")
+    sinks = {"dir": DirectorySink, "tar": TarSink, "zip": ZipSink}
+    if kind not in sinks:
+        raise ValueError(f"Unknown sink {kind!r}; expected dir, tar or zip")
+    return sinks[kind](target)
+
+
+class ManifestWriter:
+    """Append one JSON record per line and flush it immediately."""
+
+    def __init__(self, target):
+        self.lock = threading.Lock()
+        self.owns_stream = target != "-"
+        self.stream = open(target, "w", encoding="utf-8") if self.owns_stream else sys.stdout
+
+    def write(self, record):
+        import json
+
+        line = json.dumps(record, separators=(",", ":"))
+        with self.lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def close(self):
+        if self.owns_stream:
+            self.stream.close()
+
+
+class StreamOutput:
+    """Streams each swatch as it is produced to a sink and/or JSON Lines manifest."""
+
+    def __init__(self, sink=None, manifest=None, inline=False):
+        self.sink = sink
+        self.manifest = manifest
+        self.inline = inline
+        self.count = 0
+        self.used_filenames = set()
+        self.lock = threading.Lock()  # Swatches may be written from a background thread
+
+    def _unique_filename(self, name):
+        filename, suffix = f"{name}.png", 2
+        while filename in self.used_filenames:
+            filename = f"{name}_{suffix}.png"
+            suffix += 1
+        self.used_filenames.add(filename)
+        return filename
+
+    def emit(self, record, crop=None, data=None):
+        """Store a crop (or its PNG bytes) and publish its record.
+
+        Fills in "file" when a sink is set; names repeated across sheets
+        get a numeric suffix rather than overwriting each other.
+        """
+        if data is None and (self.sink is not None or self.inline):
+            data = encode_png(crop)
+        with self.lock:
+            if self.sink is not None:
+                record["file"] = self.sink.write(self._unique_filename(record["name"]), data)
+            if self.inline:
+                import base64
+                record["png_base64"] = base64.b64encode(data).decode("ascii")
+            if self.manifest is not None:
+                self.manifest.write(record)
+            self.count += 1
+        return record
+
+    @property
+    def removable(self):
+        """True if written swatches are files that undo can delete again
+        (loose files or a dir: sink), False for tar and zip archives."""
+        return self.sink is None or isinstance(self.sink, DirectorySink)
+
+    def release(self, filename):
+        """Let a later swatch reuse the filename of one whose file was removed."""
+        with self.lock:
+            self.used_filenames.discard(filename)
+
+    def event(self, kind, record, **extra):
+        """Publish a later edit (delete/restore/rename) of an emitted record.
+
+        Archive members cannot be removed from a stream, so consumers are
+        expected to apply these events to the records they already read.
+        """
+        if self.manifest is not None:
+            event = {key: value for key, value in record.items() if key != "png_base64"}
+            event.update(extra, event=kind)
+            with self.lock:
+                self.manifest.write(event)
+
+    def close(self):
+        if self.sink is not None:
+            self.sink.close()
+        if self.manifest is not None:
+            self.manifest.close()
+
+
+def make_swatch_record(name, bounds, crop):
+    """Describe one swatch: name, bounds (right/bottom exclusive) and mean color."""
+    from PIL import ImageStat
+
+    mean = ImageStat.Stat(crop.convert('RGB')).mean
+    return {
+        "name": name,
+        "bounds": [int(v) for v in bounds],
+        "color": "#{:02x}{:02x}{:02x}".format(*(int(round(c)) for c in mean)),
+    }
+
+
+def clean_swatch_name(text):
+    """Normalize free text into a swatch file name (as OCR results are)."""
+    text = ''.join(c for c in text if c.isalnum() or c in ' _-')
+    return text.strip().replace(' ', '_').lower()
+
+
+def _page_color(image):
+    """Most common color among the four corners, taken as the page background."""
+    w, h = image.size
+    corners = [image.getpixel(p) for p in ((0, 0), (w - 1, 0), (0, h - 1), (w - 1, h - 1))]
+    return max(set(corners), key=corners.count)
+
+
+def auto_detect_swatches(detector, min_size=20, max_fraction=0.5):
+    """Find solid swatches on a sheet without a template.
+
+    Seeds a grid of clicks over the sheet and keeps each distinct region
+    that is large enough and differs from the page background.
+    """
+    width, height = detector.width, detector.height
+    step = max(10, min(width, height) // 40)
+    work, scale = detector.work, detector.detect_scale
+    background = _page_color(work)
+    found = []
+
+    for y in range(step // 2, height, step):
+        for x in range(step // 2, width, step):
+            if any(b[0] <= x < b[2] and b[1] <= y < b[3] for b in found):
+                continue
+            pixel = work.getpixel((min(x // scale, work.width - 1), min(y // scale, work.height - 1)))
+            if sum(abs(pixel[i] - background[i]) for i in range(3)) < 30:
+                continue
+            x1, y1, x2, y2 = detector.find_color_boundaries(x, y)
+            if x2 - x1 < min_size or y2 - y1 < min_size:
+                continue
+            if (x2 - x1) * (y2 - y1) > max_fraction * width * height:
+                continue
+            found.append((x1, y1, x2, y2))
+
+    found.sort(key=lambda b: (b[1] // step, b[0]))
+    return found
+
+
+def extract_sheet(detector, template=None):
+    """Detect and name the swatches of one sheet.
+
+    The optional template mirrors what an operator teaches the GUI:
+      {"swatches": [{"x": 120, "y": 340, "name": "optional"},
+                    {"box": [x1, y1, x2, y2]}],
+       "text_box": [offset_x, offset_y, width, height],
+       "texture": false,
+       "threshold": 30,
+       "detect_scale": 1}
+    "threshold" may also be "auto" to tune it per swatch from the local
+    noise level; "detect_scale" downsamples the detection image. Without "swatches" every solid swatch is found automatically. The
+    text box is relative to each swatch's top-left corner, as learned in
+    the GUI.
+
+    Returns a list of (record, crop) pairs, where record holds the name,
+    bounds and mean color.
+    """
+    template = template or {}
+    text_box = template.get("text_box")
+    if text_box is None and template.get("use_learned_text_box", True):
+        text_box = detector.shared.get_text_template()
+
+    if "detect_scale" in template:
+        detector.set_detect_scale(template["detect_scale"])
+    threshold = template.get("threshold")
+    if threshold == "auto":
+        detector.auto_threshold = True
+    elif threshold is not None:
+        detector.threshold = int(threshold)
+
+    specs = template.get("swatches")
+    if specs is None:
+        specs = [{"box": list(box)} for box in auto_detect_swatches(detector)]
+
+    results = []
+    used_names = set()
+    for number, spec in enumerate(specs, start=1):
+        if "box" in spec:
+            x1, y1, x2, y2 = detector.clamp_box(tuple(int(v) for v in spec["box"]))
+            if template.get("texture"):
+                x1, y1, x2, y2 = detector.find_swatch_in_region(x1, y1, x2, y2)
+        else:
+            find = (detector.find_textured_swatch_boundaries if template.get("texture")
+                    else detector.find_color_boundaries)
+            bounds = find(int(spec["x"]), int(spec["y"]))
+            if bounds is None:
+                print(f"Skipping swatch {number}: ({spec['x']}, {spec['y']}) is off the sheet",
+                      file=sys.stderr)
+                continue
+            x1, y1, x2, y2 = bounds
+        if x2 - x1 < 1 or y2 - y1 < 1:
+            continue
+
+        name = spec.get("name")
+        if not name and text_box is not None:
+            dx, dy, tw, th = text_box
+            name = detector.extract_text_from_box(x1 + dx, y1 + dy, x1 + dx + tw, y1 + dy + th)
+        name = clean_swatch_name(name or "") or f"swatch_{number:03d}"
+        base, suffix = name, 2
+        while name in used_names:
+            name = f"{base}_{suffix}"
+            suffix += 1
+        used_names.add(name)
+
+        crop, scale = detector.crop((x1, y1, x2, y2))
+        record = make_swatch_record(name, (x1, y1, x2, y2), crop)
+        if scale != 1.0:
+            record["scale"] = scale
+        results.append((record, crop))
+    return results
+
+
+class TemplateError(ValueError):
+    """A template that does not fit extract_sheet or the sheet it is used on."""
+
+
+def validate_template(template, size=None):
+    """Raise TemplateError if a template does not have the shape extract_sheet expects.
+
+    With the sheet size, coordinates must also lie on the sheet, so a bad
+    point or box cannot ask for an enormous crop.
+    """
+    def numbers(value, count):
+        return (isinstance(value, (list, tuple)) and len(value) == count
+                and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value))
+
+    if template is None:
+        return
+    if not isinstance(template, dict):
+        raise TemplateError("template must be a JSON object")
+    specs = template.get("swatches")
+    if specs is not None:
+        if not isinstance(specs, list):
+            raise TemplateError('template "swatches" must be a list')
+        for number, spec in enumerate(specs, start=1):
+            if not isinstance(spec, dict):
+                raise TemplateError(f"template swatch {number} must be an object")
+            if "box" in spec:
+                if not numbers(spec["box"], 4):
+                    raise TemplateError(f'template swatch {number}: "box" must be [x1, y1, x2, y2]')
+                x1, y1, x2, y2 = spec["box"]
+                if size is not None and not (0 <= x1 < x2 <= size[0] and 0 <= y1 < y2 <= size[1]):
+                    raise TemplateError(f"template swatch {number}: box {spec['box']} is not "
+                                        f"inside the {size[0]}x{size[1]} sheet")
+            elif not numbers([spec.get("x"), spec.get("y")], 2):
+                raise TemplateError(f'template swatch {number} needs numeric "x" and "y", or a "box"')
+            elif size is not None and not (0 <= spec["x"] < size[0] and 0 <= spec["y"] < size[1]):
+                raise TemplateError(f"template swatch {number}: ({spec['x']}, {spec['y']}) is off "
+                                    f"the {size[0]}x{size[1]} sheet")
+    text_box = template.get("text_box")
+    if text_box is not None:
+        if not numbers(text_box, 4):
+            raise TemplateError('template "text_box" must be [offset_x, offset_y, width, height]')
+        if size is not None and not (abs(text_box[0]) <= size[0] and abs(text_box[1]) <= size[1]
+                                     and 0 < text_box[2] <= size[0] and 0 < text_box[3] <= size[1]):
+            raise TemplateError(f'template "text_box" {text_box} does not fit the '
+                                f"{size[0]}x{size[1]} sheet")
+    threshold = template.get("threshold")
+    if threshold not in (None, "auto") and not numbers([threshold], 1):
+        raise TemplateError('template "threshold" must be a number or "auto"')
+    if "detect_scale" in template and not numbers([template["detect_scale"]], 1):
+        raise TemplateError('template "detect_scale" must be a number')
+
+
+def build_atlas(results, padding=2, max_width=2048):
+    """Shelf-pack swatch crops into one image; adds an "atlas" rect to each record."""
+    from PIL import Image
+
+    if not results:
+        return None
+    width = max(min(max_width, sum(c.width + padding for _, c in results)),
+                max(c.width for _, c in results))
+    x = y = shelf_height = 0
+    for record, crop in sorted(results, key=lambda rc: -rc[1].height):
+        if x and x + crop.width > width:
+            x, y = 0, y + shelf_height + padding
+            shelf_height = 0
+        record["atlas"] = [x, y, crop.width, crop.height]
+        x += crop.width + padding
+        shelf_height = max(shelf_height, crop.height)
+
+    atlas = Image.new('RGBA', (width, y + shelf_height), (0, 0, 0, 0))
+    for record, crop in results:
+        ax, ay, _, _ = record["atlas"]
+        atlas.paste(crop.convert('RGBA'), (ax, ay))
+    return atlas
+
+
+def _warm_worker():
+    """Process pool initializer: load imaging and OCR code before the first job."""
+    _import_heavy_modules()
+
+
+def run_extraction_job(image_bytes, template=None, deskew=True):
+    """Worker entry point: extract an uploaded sheet into a manifest and atlas PNG.
+
+    Raises TemplateError if the template's coordinates do not fit the sheet.
+    """
+    import hashlib
+    import io
+    import time
+    from PIL import Image
+
+    start = time.perf_counter()
+    key = ("upload", hashlib.sha1(image_bytes).hexdigest())
+    image = Image.open(io.BytesIO(image_bytes))
+    image.load()
+    image = canonical_rgb(image)
+    angle = 0.0
+    if deskew:
+        image, angle = normalize_sheet(image, key=key)
+    validate_template(template, image.size)
+
+    detector = SwatchDetector(image, key, angle)
+    results = extract_sheet(detector, template)
+    atlas = build_atlas(results)
+    atlas_png = None
+    if atlas is not None:
+        buffer = io.BytesIO()
+        atlas.save(buffer, format="PNG")
+        atlas_png = buffer.getvalue()
+
+    return {
+        "sheet": {"width": image.width, "height": image.height, "skew_angle": angle},
+        "manifest": [record for record, _ in results],
+        "atlas_png": atlas_png,
+        "elapsed_ms": (time.perf_counter() - start) * 1000,
+    }
+
+
+class RequestError(Exception):
+    """A request the extraction server refuses, with the HTTP status to send."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ExtractionServer:
+    """Local HTTP extraction service backed by a warm process pool.
+
+    POST /extract   image as the raw body, or multipart/form-data with an
+                    "image" file and an optional "template" JSON field
+                    (a template may also be passed as ?template=<json>)
+    GET  /metrics   throughput and latency counters
+    GET  /health    liveness probe
+
+    At most `workers` jobs run at once and `max_queue` more may wait;
+    beyond that requests are refused with 503 and Retry-After, before the
+    body is read. Malformed requests, unreadable images and invalid
+    templates get 400, and bodies over `max_body` get 413.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8765, workers=None, max_queue=16,
+                 max_body=200 * 1024 * 1024, deskew=True):
+        self.host = host
+        self.port = port
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.max_queue = max_queue
+        self.max_body = max_body
+        self.deskew = deskew
+        self.pool = None
+        self.pending = 0
+        self.started = None
+        self.counters = {"requests": 0, "completed": 0, "failed": 0, "rejected": 0, "swatches": 0}
+        self.latencies = deque(maxlen=1000)
+
+    def metrics(self):
+        import time
+
+        uptime = time.monotonic() - self.started if self.started else 0.0
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 1)
+
+        return dict(
+            self.counters,
+            uptime_s=round(uptime, 1),
+            workers=self.workers,
+            in_flight=min(self.pending, self.workers),
+            queued=max(0, self.pending - self.workers),
+            queue_capacity=self.max_queue,
+            sheets_per_s=round(self.counters["completed"] / uptime, 3) if uptime else 0.0,
+            swatches_per_s=round(self.counters["swatches"] / uptime, 3) if uptime else 0.0,
+            latency_ms={"mean": round(sum(latencies) / len(latencies), 1) if latencies else None,
+                        "p50": percentile(0.5), "p95": percentile(0.95), "max": percentile(1.0)},
+        )
+
+    async def _read_line(self, reader):
+        import asyncio
+
         try:
-            configs = ['--psm 7 --oem 3', '--psm 8 --oem 3', '--psm 13 --oem 3']
-            for config in configs:
-                text = pytesseract.image_to_string(text_region, config=config).strip()
-                text = ''.join(c for c in text if c.isalnum() or c in ' _-')
-                text = text.strip().replace(' ', '_').lower()
-                if text and len(text) > 2:
-                    return text
+            return (await reader.readline()).decode("latin-1")
+        except (ValueError, asyncio.LimitOverrunError):
+            raise RequestError(400, "request line or header too long")
+
+    async def _read_head(self, reader):
+        """Read the request line and headers; the body is left for _read_body."""
+        request_line = (await self._read_line(reader)).strip()
+        if not request_line:
             return None
+        parts = request_line.split(" ", 2)
+        if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+            raise RequestError(400, f"malformed request line: {request_line[:100]!r}")
+        method, target, _ = parts
+        headers = {}
+        while True:
+            line = await self._read_line(reader)
+            if line in ("\r\n", "\n", ""):
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return method, target, headers
+
+    async def _read_body(self, reader, headers):
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise RequestError(400, "Content-Length is not a number")
+        if length < 0:
+            raise RequestError(400, "Content-Length is negative")
+        if length > self.max_body:
+            raise RequestError(413, "request body too large")
+        return await reader.readexactly(length) if length else b""
+
+    def _validate_upload(self, image_bytes, template):
+        """Reject uploads a worker could only fail on, so they get 400 rather than 500."""
+        import io
+        from PIL import Image
+
+        validate_template(template)
+        try:
+            with Image.open(io.BytesIO(image_bytes)):
+                pass  # Reads only the header; decoding is the worker's job
+        except (OSError, Image.DecompressionBombError) as e:
+            raise ValueError(f"unreadable image: {e}")
+
+    def _parse_upload(self, target, headers, body):
+        """Return (image bytes, template dict or None) from an /extract request."""
+        import json
+        from urllib.parse import urlsplit, parse_qs
+
+        query = parse_qs(urlsplit(target).query)
+        template = json.loads(query["template"][0]) if "template" in query else None
+
+        content_type = headers.get("content-type", "")
+        if not content_type.startswith("multipart/form-data"):
+            return body, template
+
+        from email.parser import BytesParser
+        from email.policy import HTTP
+
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body)
+        image_bytes = None
+        for part in message.iter_parts():
+            field = part.get_param("name", header="content-disposition")
+            payload = part.get_payload(decode=True)
+            if field == "image":
+                image_bytes = payload
+            elif field == "template" and payload:
+                template = json.loads(payload.decode("utf-8"))
+        if image_bytes is None:
+            raise ValueError('multipart upload has no "image" field')
+        return image_bytes, template
+
+    async def _respond(self, writer, status, payload, extra_headers=None):
+        import json
+
+        reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+                   500: "Internal Server Error", 503: "Service Unavailable"}
+        body = json.dumps(payload).encode("utf-8")
+        head = [f"HTTP/1.1 {status} {reasons.get(status, '')}",
+                "Content-Type: application/json",
+                f"Content-Length: {len(body)}",
+                "Connection: close"]
+        for name, value in (extra_headers or {}).items():
+            head.append(f"{name}: {value}")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def handle(self, reader, writer):
+        import asyncio
+        import base64
+        import time
+        from concurrent.futures.process import BrokenProcessPool
+
+        try:
+            try:
+                request = await self._read_head(reader)
+            except RequestError as e:
+                await self._respond(writer, e.status, {"error": str(e)})
+                return
+            if request is None:
+                return
+            method, target, headers = request
+            path = target.split("?", 1)[0]
+
+            if method == "GET" and path == "/health":
+                await self._respond(writer, 200, {"status": "ok"})
+            elif method == "GET" and path == "/metrics":
+                await self._respond(writer, 200, self.metrics())
+            elif method == "POST" and path == "/extract":
+                self.counters["requests"] += 1
+                # Refuse before reading the body, so a full queue costs no upload
+                if self.pending >= self.workers + self.max_queue:
+                    self.counters["rejected"] += 1
+                    await self._respond(writer, 503, {"error": "extraction queue is full"},
+                                        {"Retry-After": "1"})
+                    return
+
+                self.pending += 1  # Hold the slot while the body uploads
+                try:
+                    try:
+                        body = await self._read_body(reader, headers)
+                        image_bytes, template = self._parse_upload(target, headers, body)
+                        self._validate_upload(image_bytes, template)
+                    except RequestError as e:
+                        self.counters["failed"] += 1
+                        await self._respond(writer, e.status, {"error": str(e)})
+                        return
+                    except ValueError as e:
+                        self.counters["failed"] += 1
+                        await self._respond(writer, 400, {"error": str(e)})
+                        return
+
+                    start = time.perf_counter()
+                    try:
+                        loop = asyncio.get_running_loop()
+                        result = await loop.run_in_executor(self.pool, run_extraction_job,
+                                                            image_bytes, template, self.deskew)
+                    except TemplateError as e:
+                        self.counters["failed"] += 1
+                        await self._respond(writer, 400, {"error": str(e)})
+                        return
+                    except BrokenProcessPool as e:
+                        # A worker died (e.g. killed when out of memory); replace the pool
+                        self.counters["failed"] += 1
+                        self._restart_pool(self.pool)
+                        await self._respond(writer, 500, {"error": f"worker process died: {e}"})
+                        return
+                    except Exception as e:
+                        self.counters["failed"] += 1
+                        await self._respond(writer, 500, {"error": f"{type(e).__name__}: {e}"})
+                        return
+                finally:
+                    self.pending -= 1
+
+                self.latencies.append((time.perf_counter() - start) * 1000)
+                self.counters["completed"] += 1
+                self.counters["swatches"] += len(result["manifest"])
+                atlas_png = result.pop("atlas_png")
+                result["atlas_png_base64"] = base64.b64encode(atlas_png).decode("ascii") if atlas_png else None
+                await self._respond(writer, 200, result)
+            else:
+                await self._respond(writer, 404, {"error": f"no route for {method} {path}"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _restart_pool(self, broken=None):
+        """Start the worker pool, replacing `broken` if it is still the current one."""
+        from concurrent.futures import ProcessPoolExecutor
+
+        if broken is not None:
+            if self.pool is not broken:
+                return  # Another request already replaced it
+            broken.shutdown(wait=False)
+            print("A worker process died; restarting the worker pool", file=sys.stderr)
+        # Workers forked from a request handler would inherit open client
+        # sockets, so fork them from a clean fork server where there is one
+        import multiprocessing
+
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else None)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker,
+                                        mp_context=context)
+
+    async def serve(self):
+        import asyncio
+        import time
+
+        self._restart_pool()
+        # Start every worker now so the first request doesn't pay for imports
+        await asyncio.gather(*(asyncio.get_running_loop().run_in_executor(self.pool, _import_heavy_modules)
+                               for _ in range(self.workers)))
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.started = time.monotonic()
+        print(f"Serving swatch extraction on http://{self.host}:{self.port} with {self.workers} workers")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.pool.shutdown(cancel_futures=True)
+
+
+def run_server(host, port, workers=None, max_queue=16, deskew=True):
+    import asyncio
+
+    server = ExtractionServer(host, port, workers, max_queue, deskew=deskew)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+
+
+def run_page_job(source, template=None, deskew=True, output_dpi=DEFAULT_OUTPUT_DPI, detect_scale=1):
+    """Extract one sheet; returns [(record, png bytes)] so results pickle cheaply."""
+    image, angle = open_sheet(source, deskew)
+    detector = SwatchDetector(image, source.key, angle, source=source, output_dpi=output_dpi,
+                              detect_scale=detect_scale)
+    results = []
+    for record, crop in extract_sheet(detector, template):
+        record["sheet"] = source.path
+        if source.page is not None:
+            record["page"] = source.page + 1
+        results.append((record, encode_png(crop)))
+    return results
+
+
+def run_batch(paths, output, template=None, deskew=True, dpi=DEFAULT_PDF_DPI, jobs=1,
+              output_dpi=DEFAULT_OUTPUT_DPI, detect_scale=1):
+    """Extract every page of every sheet headlessly, streaming each swatch to output.
+
+    Pages are enumerated lazily and fed to `jobs` worker processes, with
+    only a small window of pages in flight so whole catalogs are never
+    rendered up front. Results are emitted in page order.
+    """
+    sources = expand_sources(paths, dpi)
+
+    def emit(source, get_results):
+        try:
+            results = get_results()
         except Exception as e:
-            print(f"OCR error: {e}")
-            return None
-    
-    def save_swatch(self, x1, y1, x2, y2, name):
-        # Get current output directory (in case user typed a new path)
-        output_dir = self.get_output_dir()
-        
-        swatch = self.original_image.crop((x1, y1, x2, y2))
-        filename = f"{name}.png"
-        filepath = os.path.join(output_dir, filename)
-        swatch.save(filepath)
-        
-        self.extracted_count += 1
-        self.status_label.config(text=f"Saved: {filename}", fg="green")
-        self.extracted_label.config(text=f"Extracted: {self.extracted_count}")
+            print(f"Error extracting {source.label}: {e}", file=sys.stderr)
+            return
+        for record, data in results:
+            output.emit(record, data=data)
+
+    if jobs <= 1:
+        for source in sources:
+            emit(source, lambda: run_page_job(source, template, deskew, output_dpi, detect_scale))
+        return output.count
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    window = deque()
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_warm_worker) as pool:
+        for source in sources:
+            window.append((source, pool.submit(run_page_job, source, template, deskew, output_dpi,
+                                                    detect_scale).result))
+            if len(window) >= 2 * jobs:
+                emit(*window.popleft())
+        while window:
+            emit(*window.popleft())
+    return output.count
+
+
+def build_output(args, default_dir=None):
+    """Create the StreamOutput described by --sink/--jsonl/--inline."""
+    streams_to_stdout = args.sink is not None and args.sink.endswith(":-")
+    if streams_to_stdout and args.jsonl == "-":
+        raise ValueError("--jsonl and --sink cannot both write to stdout")
+    if args.sink == "none" and not (args.inline and args.jsonl):
+        raise ValueError("--sink none needs --inline and --jsonl, or swatches go nowhere")
+
+    sink = None
+    if args.sink and args.sink != "none":
+        sink = open_sink(args.sink)
+    elif args.sink is None and default_dir:
+        sink = DirectorySink(default_dir)
+    manifest = ManifestWriter(args.jsonl) if args.jsonl else None
+    return StreamOutput(sink, manifest, inline=args.inline)
+
+
+def load_template(path):
+    import json
+
+    if not path:
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# The golden file and samples/ live next to this file, wherever it is run from
+REGRESSION_DIR = os.path.dirname(os.path.abspath(__file__))
+REGRESSION_GOLDEN = os.path.join(REGRESSION_DIR, "regression_golden.json")
+
+# name, seed, options for _synthetic_sheet, extra template keys
+REGRESSION_CASES = (
+    ("solid", 1, {}, {}),
+    ("blurred", 2, {"blur": 1.5}, {}),
+    ("noisy_jpeg", 3, {"noise": 6, "jpeg": 70}, {"threshold": "auto", "swatches": "clicks"}),
+    ("rotated", 4, {"rotate": 1.5}, {}),
+    ("textured_clicks", 5, {"texture": True}, {"texture": True, "swatches": "clicks"}),
+    ("textured_regions", 6, {"texture": True}, {"texture": True, "swatches": "regions"}),
+    ("grayscale_16bit", 7, {"mode": "I;16"}, {}),
+    ("dark_16bit", 10, {"mode": "I;16", "level": 0.45}, {}),
+    ("cmyk", 8, {"mode": "CMYK"}, {}),
+    ("downsampled", 9, {"size": (2400, 1800)}, {"detect_scale": 2}),
+)
+
+
+def _synthetic_sheet(seed, size=(1200, 900), cols=4, rows=3, blur=0, noise=0, jpeg=None,
+                     rotate=0, texture=False, mode='RGB', level=1.0):
+    """Draw a seeded swatch sheet with a printed name under each swatch.
+
+    For 16-bit output, level scales the samples (below 1 for a dark scan).
+    Returns (image, swatch boxes); boxes are before any rotation.
+    """
+    import io
+    import random
+    from PIL import Image, ImageChops, ImageDraw, ImageFilter
+
+    rng = random.Random(seed)
+    width, height = size
+    image = Image.new('RGB', size, (250, 250, 248))
+    draw = ImageDraw.Draw(image)
+    cell_w, cell_h = width // cols, height // rows
+    swatch_w, swatch_h = cell_w * 2 // 3, cell_h * 3 // 5
+    boxes = []
+    for row in range(rows):
+        for col in range(cols):
+            x1 = col * cell_w + cell_w // 6
+            y1 = row * cell_h + cell_h // 10
+            color = tuple(rng.randint(0, 220) for _ in range(3))
+            box = (x1, y1, x1 + swatch_w, y1 + swatch_h)
+            draw.rectangle((box[0], box[1], box[2] - 1, box[3] - 1), fill=color)
+            if texture:
+                for _ in range(swatch_w * swatch_h // 40):
+                    px = rng.randrange(box[0] + 2, box[2] - 4)
+                    py = rng.randrange(box[1] + 2, box[3] - 4)
+                    shade = tuple(max(0, min(255, c + rng.randint(-40, 40))) for c in color)
+                    draw.rectangle((px, py, px + 2, py + 2), fill=shade)
+            draw.text((x1, box[3] + 8), f"color {row * cols + col + 1:02d}", fill=(20, 20, 20),
+                      font_size=max(12, cell_h // 12))
+            boxes.append(box)
+
+    if blur:
+        image = image.filter(ImageFilter.GaussianBlur(blur))
+    if noise:
+        # Seeded uniform noise of the given standard deviation (effect_noise is not seedable)
+        amplitude = noise * 3 ** 0.5
+        bands = [Image.frombytes('L', size, rng.randbytes(width * height))
+                 .point(lambda v: 128 + (v - 127.5) * amplitude / 127.5) for _ in range(3)]
+        image = ImageChops.add(image, Image.merge('RGB', bands), 1, -128)
+    if jpeg:
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=jpeg)
+        image = Image.open(io.BytesIO(buffer.getvalue())).convert('RGB')
+    if rotate:
+        image = image.rotate(rotate, resample=Image.Resampling.BICUBIC, fillcolor=(250, 250, 248))
+    if mode == 'I;16':
+        import struct
+
+        gray = image.convert('L').tobytes()
+        samples = [round(v * 257 * level) for v in gray]
+        image = Image.frombytes('I;16', size, struct.pack(f"<{len(samples)}H", *samples))
+    elif mode != 'RGB':
+        image = image.convert(mode)
+    return image, boxes
+
+
+def regression_corpus(samples_dir=None):
+    """Yield (case name, image, template, deskew) for every regression case.
+
+    Covers the synthetic cases above plus any sheet checked into
+    samples_dir (next to this file by default). A sheet may come with a
+    template of the same name, e.g. samples/catalog.png + samples/catalog.json.
+    """
+    for name, seed, options, extra in REGRESSION_CASES:
+        image, boxes = _synthetic_sheet(seed, **options)
+        swatch_h = boxes[0][3] - boxes[0][1]
+        template = {"text_box": [0, swatch_h + 4, boxes[0][2] - boxes[0][0], swatch_h // 3]}
+        template.update(extra)
+        if template.get("swatches") == "clicks":
+            template["swatches"] = [{"x": (x1 + x2) // 2, "y": (y1 + y2) // 2} for x1, y1, x2, y2 in boxes]
+        elif template.get("swatches") == "regions":
+            template["swatches"] = [{"box": [x1 - 8, y1 - 8, x2 + 8, y2 + 8]} for x1, y1, x2, y2 in boxes]
+        yield name, image, template, True  # Straight sheets must come through deskew untouched
+
+    if samples_dir is None:
+        samples_dir = os.path.join(REGRESSION_DIR, "samples")
+    if not os.path.isdir(samples_dir):
+        return
+    for path in list_sheet_files(samples_dir):
+        template_path = os.path.splitext(path)[0] + ".json"
+        template = load_template(template_path) if os.path.exists(template_path) else None
+        for source in iter_sheet_sources(path):
+            image, _ = open_sheet(source, deskew=False)
+            yield f"samples/{source.label}", image, template, True
+
+
+def _pixel_hash(image):
+    import hashlib
+
+    return hashlib.sha1(image.convert('RGB').tobytes()).hexdigest()[:16]
+
+
+def _save_like_gui(results, output_dir):
+    """Store extracted swatches through store_swatch, the GUI's save path.
+
+    Saves in "link" dedup mode, then saves the first swatch a second time,
+    which must be linked to the first file. Returns the written files'
+    pixel hashes and the outcome of the repeat save.
+    """
+    from PIL import Image
+
+    output = StreamOutput()
+    files = []
+    for record, crop in results:
+        filepath, _ = store_swatch(crop, dict(record), output_dir, output, "link")
+        with Image.open(filepath) as saved:
+            files.append(_pixel_hash(saved))
+
+    repeat = None
+    if results:
+        record, crop = results[0]
+        again = dict(record, name=f"{record['name']}_again")
+        filepath, _ = store_swatch(crop, again, output_dir, output, "link")
+        repeat = {"duplicate_of": again.get("duplicate_of"), "linked": os.stat(filepath).st_nlink > 1}
+    get_swatch_index(output_dir).flush()
+    with _swatch_indexes_lock:
+        _swatch_indexes.pop(os.path.abspath(output_dir), None)
+    return files, repeat
+
+
+def _run_regression_case(name, image, template, deskew):
+    """Extract one corpus sheet as batch mode does, then save it as the GUI does.
+
+    Returns the comparable results: the skew angle, each swatch's record
+    with crop and written-file pixel hashes, and the repeat-save outcome.
+    """
+    import tempfile
+
+    shared = SharedCache()  # No OCR results carried over between runs or cases
+    key = ("regression", name)
+    template = dict(template or {}, use_learned_text_box=False)
+    image = canonical_rgb(image)
+    angle = 0.0
+    if deskew:
+        image, angle = normalize_sheet(image, key=key, shared=shared)
+    detector = SwatchDetector(image, key, angle, shared)
+    results = extract_sheet(detector, template)
+    records = []
+    for record, crop in results:
+        record["pixels"] = _pixel_hash(crop)
+        records.append(record)
+
+    with tempfile.TemporaryDirectory(prefix="swatch-regression-") as output_dir:
+        files, repeat = _save_like_gui(results, output_dir)
+    for record, file_hash in zip(records, files):
+        record["file_pixels"] = file_hash
+    return {"skew_angle": round(angle, 2), "swatches": records, "repeat_save": repeat}
+
+
+class _RegressionOCR:
+    """Deterministic stand-in for pytesseract during the regression check.
+
+    Names each label after a hash of the exact image Tesseract would be
+    given, so the text box placement, crop, enhancement and upscaling are
+    all compared without depending on which Tesseract (if any) is installed.
+    """
+
+    def image_to_string(self, image, config=""):
+        import hashlib
+
+        digest = hashlib.sha1(f"{image.mode} {image.size}".encode("ascii") + image.tobytes())
+        return f"label {digest.hexdigest()[:10]}"
+
+
+@contextmanager
+def _regression_ocr():
+    """Route get_ocr() to _RegressionOCR for the duration of the block."""
+    global _ocr_module, _ocr_checked
+
+    get_ocr()  # Settle the real probe first so it can't overwrite the stand-in
+    with _ocr_lock:
+        saved = _ocr_module, _ocr_checked
+        _ocr_module, _ocr_checked = _RegressionOCR(), True
+    try:
+        yield
+    finally:
+        with _ocr_lock:
+            _ocr_module, _ocr_checked = saved
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _reference_workload():
+    """Time a fixed workload with the same mix as extraction (Pillow filters
+    and statistics plus per-pixel Python loops); returns seconds.
+
+    Throughput is judged relative to this, measured in the same run, so the
+    golden baseline carries over between machines of different speeds.
+    """
+    import random
+    import time
+    from PIL import Image, ImageFilter, ImageStat
+
+    rng = random.Random(0)
+    image = Image.frombytes('RGB', (400, 300), rng.randbytes(400 * 300 * 3))
+    start = time.perf_counter()
+    for _ in range(4):
+        blurred = image.filter(ImageFilter.GaussianBlur(2))
+        ImageStat.Stat(blurred.convert('L')).median
+        pixels = blurred.load()
+        total = 0
+        for y in range(0, 300, 2):
+            for x in range(0, 400, 2):
+                r, g, b = pixels[x, y]
+                total += abs(r - g) + abs(g - b)
+        blurred.resize((800, 600), Image.Resampling.LANCZOS)
+    return time.perf_counter() - start
+
+
+def run_regression(golden_path=REGRESSION_GOLDEN, update=False, runs=3, tolerance=0.3):
+    """Check extraction results and throughput against a golden file.
+
+    Every corpus sheet is extracted `runs` times; the names, bounds, mean
+    colors and pixel hashes must match the golden file exactly. Throughput
+    is the best swatches/second times the best time of _reference_workload()
+    (swatches per reference run); it may be at most `tolerance` below the
+    golden baseline. With update=True the golden file is rewritten instead.
+    Returns True when everything passed.
+    """
+    import json
+    import time
+
+    corpus = list(regression_corpus())
+    results = {}
+    best = reference = None
+    with _regression_ocr():
+        for _ in range(max(1, runs)):
+            # Interleaved, so both timings see the same machine load
+            seconds = _reference_workload()
+            reference = seconds if reference is None else min(reference, seconds)
+            count = 0
+            start = time.perf_counter()
+            for name, image, template, deskew in corpus:
+                results[name] = _run_regression_case(name, image, template, deskew)
+                count += len(results[name]["swatches"])
+            elapsed = time.perf_counter() - start
+            rate = count / elapsed if elapsed > 0 else 0.0
+            best = rate if best is None else max(best, rate)
+    relative = best * reference
+
+    peak_rss = _peak_rss_mb()
+    total = sum(len(result["swatches"]) for result in results.values())
+    memory = f", peak RSS {peak_rss:.0f} MB" if peak_rss is not None else ""
+    print(f"Extracted {total} swatches from {len(corpus)} sheets: best {best:.1f} swatches/s, "
+          f"{relative:.2f} per reference run ({reference * 1000:.0f} ms){memory}")
+
+    if update:
+        golden = {"version": 2, "swatches_per_reference": round(relative, 3),
+                  "swatches_per_second": round(best, 2),
+                  "peak_rss_mb": round(peak_rss, 1) if peak_rss is not None else None,
+                  "cases": results}
+        with open(golden_path, "w", encoding="utf-8") as f:
+            json.dump(golden, f, indent=1, sort_keys=True)
+            f.write("\n")
+        print(f"Wrote {golden_path}")
+        return True
+
+    try:
+        with open(golden_path, "r", encoding="utf-8") as f:
+            golden = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Could not read golden file {golden_path}: {e} (create it with --update-golden)")
+        return False
+
+    if golden.get("version") != 2:
+        print(f"Golden file {golden_path} is from an older format; rewrite it with --update-golden")
+        return False
+    fields = ("name", "bounds", "color", "pixels", "file_pixels")
+
+    failures = 0
+    for name in sorted(set(golden["cases"]) | set(results)):
+        expected, actual = golden["cases"].get(name), results.get(name)
+        if expected is None or actual is None:
+            print(f"FAIL {name}: {'not in the golden file' if expected is None else 'missing from the corpus'}")
+            failures += 1
+            continue
+        diffs = [f"{field}: {actual.get(field)}, expected {expected.get(field)}"
+                 for field in ("skew_angle", "repeat_save") if expected.get(field) != actual.get(field)]
+        expected, actual = expected["swatches"], actual["swatches"]
+        if len(expected) != len(actual):
+            diffs.append(f"{len(actual)} swatches, expected {len(expected)}")
+        for index, (want, got) in enumerate(zip(expected, actual)):
+            for field in fields:
+                if want.get(field) != got.get(field):
+                    diffs.append(f"swatch {index + 1} {field}: {got.get(field)}, expected {want.get(field)}")
+        if diffs:
+            failures += 1
+            print(f"FAIL {name}: " + "; ".join(diffs[:5]) + (" ..." if len(diffs) > 5 else ""))
+
+    baseline = golden.get("swatches_per_reference")
+    if baseline and relative < baseline * (1 - tolerance):
+        failures += 1
+        print(f"FAIL throughput: {relative:.2f} swatches per reference run is more than "
+              f"{tolerance:.0%} below the golden {baseline:.2f}")
+    if peak_rss is not None and golden.get("peak_rss_mb"):
+        print(f"Peak RSS {peak_rss:.0f} MB (golden {golden['peak_rss_mb']:.0f} MB)")
+
+    print("Regression check passed" if not failures else f"Regression check failed ({failures} problems)")
+    return failures == 0
+
+
+def parse_args(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Extract color swatches from product sheets.")
+    parser.add_argument("paths", nargs="*", metavar="path",
+                        help="image file or folder of sheets to open (several for --batch)")
+    parser.add_argument("--benchmark-startup", action="store_true",
+                        help="measure cold import time and exit non-zero if over target")
+    parser.add_argument("--target-ms", type=float, default=COLD_START_TARGET_MS,
+                        help=f"cold start target for --benchmark-startup (default {COLD_START_TARGET_MS})")
+    parser.add_argument("--no-deskew", dest="deskew", action="store_false",
+                        help="use sheets as scanned instead of straightening them first")
+    parser.add_argument("--dpi", type=int, default=DEFAULT_PDF_DPI,
+                        help=f"resolution PDF pages are rendered at for detection (default {DEFAULT_PDF_DPI})")
+    parser.add_argument("--detect-scale", type=int, default=1, metavar="N",
+                        help="run swatch detection on a copy downsampled N times; bounds are refined "
+                             "at full resolution (default 1)")
+    parser.add_argument("--memory-budget", type=int, default=DEFAULT_MEMORY_BUDGET_MB, metavar="MB",
+                        help="memory for decoded sheets, display buffers and caches before derived "
+                             f"buffers are evicted (default {DEFAULT_MEMORY_BUDGET_MB})")
+    parser.add_argument("--output-dpi", type=int, default=DEFAULT_OUTPUT_DPI,
+                        help="resolution swatch and label boxes of PDF pages are re-rendered at "
+                             f"for saving and OCR; 0 crops the detection render (default {DEFAULT_OUTPUT_DPI})")
+
+    regression = parser.add_argument_group("regression check")
+    regression.add_argument("--regression", action="store_true",
+                            help="extract the regression corpus, compare it with the golden file "
+                                 "and exit non-zero on differences or a throughput drop")
+    regression.add_argument("--golden", default=REGRESSION_GOLDEN,
+                            help="golden results file (default regression_golden.json next to this script)")
+    regression.add_argument("--update-golden", action="store_true",
+                            help="rewrite the golden file from the current results")
+    regression.add_argument("--regression-runs", type=int, default=3,
+                            help="extraction passes; the best throughput counts (default 3)")
+    regression.add_argument("--throughput-tolerance", type=float, default=0.3,
+                            help="allowed fractional drop in throughput relative to the "
+                                 "reference workload (default 0.3)")
+
+    output = parser.add_argument_group("streaming output")
+    output.add_argument("--batch", action="store_true",
+                        help="extract the given sheets without the GUI, using --template if given")
+    output.add_argument("--template", help="layout template JSON for --batch (see the README)")
+    output.add_argument("--jobs", type=int, default=1,
+                        help="pages extracted in parallel worker processes by --batch")
+    output.add_argument("--jsonl", metavar="FILE",
+                        help="write one JSON record per saved swatch to FILE ('-' for stdout)")
+    output.add_argument("--sink", metavar="KIND:PATH",
+                        help="store swatches in dir:PATH, tar:PATH or zip:PATH ('-' for stdout), "
+                             "or 'none' with --inline")
+    output.add_argument("--inline", action="store_true",
+                        help="embed each swatch PNG as base64 in its JSON record")
+
+    server = parser.add_argument_group("extraction service")
+    server.add_argument("--serve", action="store_true", help="run the local HTTP extraction service")
+    server.add_argument("--host", default="127.0.0.1", help="address to listen on (default 127.0.0.1)")
+    server.add_argument("--port", type=int, default=8765, help="port to listen on (default 8765)")
+    server.add_argument("--workers", type=int, default=None, help="worker processes (default: CPUs - 1)")
+    server.add_argument("--queue", type=int, default=16, help="requests allowed to wait for a worker")
+    return parser.parse_args(argv)
 
 
 def main():
-    import sys
-    
+    import multiprocessing
+    multiprocessing.freeze_support()  # Worker processes of the frozen build
+
+    args = parse_args()
+    MEMORY.budget = args.memory_budget * 1024 * 1024
+    if args.benchmark_startup:
+        sys.exit(0 if benchmark_startup(args.target_ms) else 1)
+    if args.regression or args.update_golden:
+        sys.exit(0 if run_regression(args.golden, update=args.update_golden, runs=args.regression_runs,
+                                     tolerance=args.throughput_tolerance) else 1)
+    if args.serve:
+        run_server(args.host, args.port, args.workers, args.queue, deskew=args.deskew)
+        return
+    if args.batch:
+        try:
+            output = build_output(args, default_dir="color_swatches")
+        except (ValueError, OSError) as e:
+            sys.exit(f"Error: {e}")
+        try:
+            count = run_batch(args.paths, output, load_template(args.template), args.deskew,
+                              dpi=args.dpi, jobs=args.jobs, output_dpi=args.output_dpi,
+                              detect_scale=args.detect_scale)
+        except (RuntimeError, OSError, ValueError) as e:
+            sys.exit(f"Error: {e}")
+        finally:
+            output.close()
+        print(f"✓ Extracted {count} swatches", file=sys.stderr)
+        return
+
     root = tk.Tk()
     
     # Set window icon early
@@ -933,7 +4202,7 @@ def main():
                 icon = tk.PhotoImage(file=icon_path)
                 root.iconphoto(True, icon)
     except Exception as e:
-        print(f"Could not load icon: {e}")
+        print(f"Could not load icon: {e}", file=sys.stderr)
     
     root.withdraw()
     
@@ -949,14 +4218,14 @@ def main():
         if os.path.exists(ico_path):
             file_dialog.iconbitmap(ico_path)
     except Exception as e:
-        print(f"Could not load icon for dialog: {e}")
+        print(f"Could not load icon for dialog: {e}", file=sys.stderr)
     
     file_dialog.title("Color Swatch Extractor - Select Image")
-    file_dialog.geometry("600x200")
+    file_dialog.geometry("680x200")
     file_dialog.resizable(False, False)
     
     file_dialog.update_idletasks()
-    x = (file_dialog.winfo_screenwidth() // 2) - 300
+    x = (file_dialog.winfo_screenwidth() // 2) - 340
     y = (file_dialog.winfo_screenheight() // 2) - 100
     file_dialog.geometry(f'+{x}+{y}')
     
@@ -966,7 +4235,8 @@ def main():
         filepath = filedialog.askopenfilename(
             title="Select image file",
             filetypes=[
-                ("Image files", "*.png *.jpg *.jpeg *.bmp *.tiff *.gif"),
+                ("Image files", "*.png *.jpg *.jpeg *.bmp *.tiff *.tif *.gif *.pdf"),
+                ("PDF catalogs", "*.pdf"),
                 ("PNG files", "*.png"),
                 ("All files", "*.*")
             ]
@@ -974,6 +4244,12 @@ def main():
         if filepath:
             path_entry.delete(0, tk.END)
             path_entry.insert(0, filepath)
+
+    def on_browse_folder():
+        folder = filedialog.askdirectory(title="Select folder of sheets")
+        if folder:
+            path_entry.delete(0, tk.END)
+            path_entry.insert(0, folder)
     
     def on_start():
         filepath = path_entry.get().strip().strip('"')
@@ -981,7 +4257,7 @@ def main():
             selected_file["path"] = filepath
             file_dialog.destroy()
         else:
-            messagebox.showerror("Error", "Please select a valid image file.", parent=file_dialog)
+            messagebox.showerror("Error", "Please select a valid image file or folder.", parent=file_dialog)
     
     def on_cancel():
         file_dialog.destroy()
@@ -992,7 +4268,7 @@ def main():
     frame = tk.Frame(file_dialog)
     frame.pack(pady=10, padx=20, fill=tk.X)
     
-    tk.Label(frame, text="Image File:", font=("Arial", 10)).pack(anchor=tk.W)
+    tk.Label(frame, text="Image File or Folder:", font=("Arial", 10)).pack(anchor=tk.W)
     
     path_frame = tk.Frame(frame)
     path_frame.pack(fill=tk.X, pady=5)
@@ -1000,11 +4276,14 @@ def main():
     path_entry = tk.Entry(path_frame, font=("Arial", 10), width=50)
     path_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 5))
     
-    if len(sys.argv) > 1:
-        path_entry.insert(0, sys.argv[1].strip('"'))
+    if args.paths:
+        path_entry.insert(0, args.paths[0].strip('"'))
     
     browse_btn = tk.Button(path_frame, text="Browse...", command=on_browse, width=10)
     browse_btn.pack(side=tk.LEFT)
+
+    folder_btn = tk.Button(path_frame, text="Folder...", command=on_browse_folder, width=10)
+    folder_btn.pack(side=tk.LEFT, padx=(5, 0))
     
     button_frame = tk.Frame(file_dialog)
     button_frame.pack(pady=15)
@@ -1017,17 +4296,41 @@ def main():
     
     path_entry.bind("<Return>", lambda e: on_start())
     file_dialog.protocol("WM_DELETE_WINDOW", on_cancel)
+
+    # Load PIL and the OCR engine while the operator picks a file
+    file_dialog.after_idle(start_background_imports)
     file_dialog.wait_window()
     
     if selected_file["path"]:
         root.deiconify()
         try:
-            app = SwatchExtractor(root, selected_file["path"])
-            root.mainloop()
-            print(f"\n✓ Extracted {app.extracted_count} swatches to: {app.output_dir}")
+            output = build_output(args)
+        except (ValueError, OSError) as e:
+            messagebox.showerror("Error", f"Invalid output options:\n{e}")
+            root.destroy()
+            return
+        try:
+            path = selected_file["path"]
+            sources = list(expand_sources([path], args.dpi))
+            if len(sources) > 1 or os.path.isdir(path):
+                title = os.path.basename(os.path.abspath(path))
+                workspace = Workspace(root, sources, title, deskew=args.deskew, output=output,
+                                      output_dpi=args.output_dpi, detect_scale=args.detect_scale)
+                root.mainloop()
+                workspace.shutdown()
+                print(f"\n✓ Extracted {workspace.extracted_count} swatches to: {', '.join(workspace.output_dirs)}",
+                      file=sys.stderr)
+            else:
+                app = SwatchExtractor(root, sources[0], deskew=args.deskew, output=output,
+                                      output_dpi=args.output_dpi, detect_scale=args.detect_scale)
+                root.mainloop()
+                app.shutdown()
+                print(f"\n✓ Extracted {app.extracted_count} swatches to: {app.output_dir}", file=sys.stderr)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load image:\n{e}")
-            print(f"Error: {e}")
+            print(f"Error: {e}", file=sys.stderr)
+        finally:
+            output.close()
     else:
         root.destroy()
 